@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Parity check + benchmark: recursive vs. stepwise lag-12 forecaster.
+
+For every prime (M') spec with ``log_icms_lag12``, fits the model on a
+prepare_base.json output and builds the future exog twice: with the legacy
+stepwise filler (one ``get_forecast`` per unknown lag-12 step, quadratic in
+the horizon) and with the single-pass recursive forecaster used by
+``run_sarimax_models._build_future_exog``. Reports the timings and the
+largest absolute difference in the filled regressor and in the final
+``get_forecast`` point forecasts; exits non-zero if they differ by more
+than --tol (log scale).
+
+Usage:
+    python benchmarks/bench_lag12_forecast.py --output-dir workspace/outputs/runs/<run-id>
+    python benchmarks/bench_lag12_forecast.py --output-dir <dir> --extend 36
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from steps.run_sarimax_models import (  # noqa: E402
+    ALL_MODEL_SPECS,
+    _fit_model,
+    _forecast_lag12_recursive,
+    _forecast_lag12_stepwise,
+)
+
+
+def _extend_future(future_df, months):
+    """Repeat the last future row to stretch the horizon (lag-12 left unknown)."""
+    if months <= 0:
+        return future_df
+    extra = pd.DataFrame([future_df.iloc[-1]] * months).reset_index(drop=True)
+    extra["log_icms_lag12"] = np.nan
+    return pd.concat([future_df, extra], ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output-dir", required=True, help="Run dir containing prepare_base.json")
+    parser.add_argument("--extend", type=int, default=0,
+                        help="Extra months appended to the horizon (stress the recursion)")
+    parser.add_argument("--tol", type=float, default=1e-8)
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    base = json.loads((Path(args.output_dir) / "prepare_base.json").read_text(encoding="utf-8"))
+    train_df = pd.DataFrame(base["train_data"])
+    future_df = _extend_future(pd.DataFrame(base["future_data"]), args.extend)
+    y = np.log(train_df["icms_sp"].astype(float))
+
+    rows, worst = [], 0.0
+    print(f"{'Modelo':<12} {'steps':>6} {'stepwise (s)':>13} {'recursive (s)':>14} "
+          f"{'max |Δlag12|':>13} {'max |Δfc|':>11}")
+    for name, spec in ALL_MODEL_SPECS.items():
+        if "log_icms_lag12" not in spec["exog_cols"]:
+            continue
+        result = _fit_model(y, train_df[spec["exog_cols"]].astype(float),
+                            spec["order"], spec["seasonal_order"])
+        X_future = future_df[spec["exog_cols"]].astype(float)
+
+        t0 = time.perf_counter()
+        X_step = _forecast_lag12_stepwise(result, X_future)
+        t_step = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        X_rec, _ = _forecast_lag12_recursive(result, X_future)
+        t_rec = time.perf_counter() - t0
+
+        fc_step = result.get_forecast(steps=len(X_step), exog=X_step).predicted_mean.values
+        fc_rec = result.get_forecast(steps=len(X_rec), exog=X_rec).predicted_mean.values
+        d_lag = float(np.nanmax(np.abs(X_step["log_icms_lag12"].values
+                                       - X_rec["log_icms_lag12"].values)))
+        d_fc = float(np.max(np.abs(fc_step - fc_rec)))
+        worst = max(worst, d_lag, d_fc)
+
+        print(f"{name:<12} {len(X_future):>6} {t_step:>13.3f} {t_rec:>14.5f} "
+              f"{d_lag:>13.2e} {d_fc:>11.2e}")
+        rows.append({
+            "model": name,
+            "n_steps": len(X_future),
+            "stepwise_s": round(t_step, 4),
+            "recursive_s": round(t_rec, 5),
+            "max_lag12_diff": d_lag,
+            "max_forecast_diff": d_fc,
+        })
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"tol": args.tol, "models": rows},
+                                              ensure_ascii=False, indent=2), encoding="utf-8")
+    if worst > args.tol:
+        print(f"PARITY FAILED: max diff {worst:.2e} > tol {args.tol:.0e}")
+        sys.exit(1)
+    print(f"parity ok (max diff {worst:.2e})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Benchmark: CI-width error of the MC samplers at equal path counts.
+
+Fits the selected specs on a prepare_base.json output, estimates reference
+annual-total bands (p5, p95 and the p5-p95 width) from one large plain-MC
+run, then repeats each sampler of ``run_sarimax_models.MC_SAMPLERS`` over
+independent seeds at the given path counts and reports the RMSE (R$ bi)
+of the estimated bands against the reference. Lower is better; the ratio
+column is the plain-MC width RMSE divided by the sampler's.
+
+Usage:
+    python benchmarks/bench_mc_samplers.py --output-dir workspace/outputs/runs/<run-id>
+    python benchmarks/bench_mc_samplers.py --output-dir <dir> --n-paths 256 1024 --reps 30
+    python benchmarks/bench_mc_samplers.py --output-dir <dir> --json bench_samplers.json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from steps.run_sarimax_models import (  # noqa: E402
+    ALL_MODEL_SPECS,
+    MC_SAMPLERS,
+    _aggregate_mc_paths,
+    _build_future_exog,
+    _fit_model,
+    _run_monte_carlo,
+)
+
+
+def _bands(paths, years):
+    """Annual (p5, p95, width) in R$ bi, shape (3, years)."""
+    annual = _aggregate_mc_paths(paths[None], years)["annual"][0] / 1e9
+    p5, p95 = np.percentile(annual, [5, 95], axis=0)
+    return np.stack([p5, p95, p95 - p5])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output-dir", required=True, help="Run dir containing prepare_base.json")
+    parser.add_argument("--models", nargs="*", default=["Modelo 4", "Modelo 3'"],
+                        help="Model names to benchmark")
+    parser.add_argument("--n-paths", nargs="*", type=int, default=[256, 1024])
+    parser.add_argument("--reps", type=int, default=20, help="Independent seeds per sampler")
+    parser.add_argument("--reference-paths", type=int, default=200_000)
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    base = json.loads((Path(args.output_dir) / "prepare_base.json").read_text(encoding="utf-8"))
+    train_df = pd.DataFrame(base["train_data"])
+    future_df = pd.DataFrame(base["future_data"])
+    future_df["data"] = pd.to_datetime(future_df["data"])
+    y = np.log(train_df["icms_sp"].astype(float))
+    n_future = len(future_df)
+    years = future_df["data"].dt.year.values
+
+    rows = []
+    print(f"{'Modelo':<12} {'paths':>6} {'sampler':<11} {'rmse p5':>8} {'rmse p95':>9} "
+          f"{'rmse width':>11} {'ratio':>6} {'ms/run':>7}")
+    for name in args.models:
+        spec = ALL_MODEL_SPECS[name]
+        result = _fit_model(y, train_df[spec["exog_cols"]].astype(float),
+                            spec["order"], spec["seasonal_order"])
+        X_future = _build_future_exog(result, spec, future_df, n_future)
+        lag12_feedback = (future_df["log_icms_lag12"].isna().values
+                          if "log_icms_lag12" in spec["exog_cols"] else None)
+
+        ref = _bands(_run_monte_carlo(result, n_future, X_future, args.reference_paths,
+                                      seed=12345, lag12_feedback=lag12_feedback), years)
+        for n_paths in args.n_paths:
+            plain_rmse = None
+            for sampler in MC_SAMPLERS:
+                errs, t0 = [], time.perf_counter()
+                for rep in range(args.reps):
+                    paths = _run_monte_carlo(result, n_future, X_future, n_paths, seed=rep,
+                                             lag12_feedback=lag12_feedback, sampler=sampler)
+                    errs.append(_bands(paths, years) - ref)
+                ms = (time.perf_counter() - t0) / args.reps * 1e3
+                rmse = np.sqrt(np.mean(np.square(errs), axis=(0, 2)))  # (p5, p95, width)
+                if sampler == "normal":
+                    plain_rmse = rmse[2]
+                ratio = plain_rmse / rmse[2] if rmse[2] > 0 else float("inf")
+                print(f"{name:<12} {n_paths:>6} {sampler:<11} {rmse[0]:>8.3f} {rmse[1]:>9.3f} "
+                      f"{rmse[2]:>11.3f} {ratio:>5.2f}x {ms:>7.1f}")
+                rows.append({
+                    "model": name,
+                    "n_paths": n_paths,
+                    "sampler": sampler,
+                    "rmse_p5_bi": round(float(rmse[0]), 4),
+                    "rmse_p95_bi": round(float(rmse[1]), 4),
+                    "rmse_width_bi": round(float(rmse[2]), 4),
+                    "width_rmse_ratio_vs_normal": round(float(ratio), 3),
+                    "ms_per_run": round(ms, 2),
+                })
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "reps": args.reps,
+            "reference_paths": args.reference_paths,
+            "results": rows,
+        }, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
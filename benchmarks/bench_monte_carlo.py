@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Benchmark: batched Monte Carlo engine vs. per-path simulate() loop.
+
+Fits every spec in ALL_MODEL_SPECS on a prepare_base.json output, then times
+the legacy loop (one ``fitted_result.simulate`` call per path) against the
+batched engine used by ``run_sarimax_models._run_monte_carlo``. Also reports
+how far the annual-total percentiles of the two engines are apart, which
+should be within Monte Carlo noise.
+
+Usage:
+    python benchmarks/bench_monte_carlo.py --output-dir workspace/outputs/runs/<run-id>
+    python benchmarks/bench_monte_carlo.py --output-dir <dir> --n-simulations 500
+    python benchmarks/bench_monte_carlo.py --output-dir <dir> --json bench_mc.json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from steps.run_sarimax_models import (  # noqa: E402
+    ALL_MODEL_SPECS,
+    N_SIMULATIONS,
+    _build_future_exog,
+    _fit_model,
+    _run_monte_carlo,
+)
+
+
+def _legacy_loop(fitted_result, n_steps, exog_future, n_simulations):
+    """Reference implementation: one simulate() call per path."""
+    sims_log = np.zeros((n_simulations, n_steps))
+    for s in range(n_simulations):
+        sim = fitted_result.simulate(nsimulations=n_steps, anchor="end", exog=exog_future)
+        sims_log[s, :] = np.asarray(sim)
+    return np.exp(sims_log)
+
+
+def _annual_percentiles(paths, years):
+    out = {}
+    for yr in sorted(set(years)):
+        sums = paths[:, years == yr].sum(axis=1)
+        out[str(yr)] = np.percentile(sums, [5, 50, 95]) / 1e9
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output-dir", required=True, help="Run dir containing prepare_base.json")
+    parser.add_argument("--n-simulations", type=int, default=N_SIMULATIONS)
+    parser.add_argument("--models", nargs="*", default=None, help="Subset of model names")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    base = json.loads((Path(args.output_dir) / "prepare_base.json").read_text(encoding="utf-8"))
+    train_df = pd.DataFrame(base["train_data"])
+    train_df["data"] = pd.to_datetime(train_df["data"])
+    future_df = pd.DataFrame(base["future_data"])
+    future_df["data"] = pd.to_datetime(future_df["data"])
+    y = np.log(train_df["icms_sp"].astype(float))
+    n_future = len(future_df)
+    years = future_df["data"].dt.year.values
+
+    rows = []
+    print(f"{'Modelo':<12} {'loop (s)':>10} {'batch (s)':>10} {'speedup':>9} {'max |Δp| (bi)':>14}")
+    for name, spec in ALL_MODEL_SPECS.items():
+        if args.models and name not in args.models:
+            continue
+        X_train = train_df[spec["exog_cols"]].astype(float)
+        result = _fit_model(y, X_train, spec["order"], spec["seasonal_order"])
+        X_future = _build_future_exog(result, spec, future_df, n_future)
+
+        t0 = time.perf_counter()
+        legacy = _legacy_loop(result, n_future, X_future, args.n_simulations)
+        t_loop = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        batch = _run_monte_carlo(result, n_future, X_future, args.n_simulations, seed=0)
+        t_batch = time.perf_counter() - t0
+
+        p_legacy = _annual_percentiles(legacy, years)
+        p_batch = _annual_percentiles(batch, years)
+        max_diff = max(float(np.max(np.abs(p_legacy[k] - p_batch[k]))) for k in p_legacy)
+
+        speedup = t_loop / t_batch if t_batch > 0 else float("inf")
+        print(f"{name:<12} {t_loop:>10.3f} {t_batch:>10.4f} {speedup:>8.0f}x {max_diff:>14.3f}")
+        rows.append({
+            "model": name,
+            "loop_s": round(t_loop, 4),
+            "batch_s": round(t_batch, 5),
+            "speedup": round(speedup, 1),
+            "max_annual_percentile_diff_bi": round(max_diff, 4),
+        })
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "n_simulations": args.n_simulations,
+            "n_future": n_future,
+            "models": rows,
+        }, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Benchmark: end-to-end run_sarimax_models on a synthetic base, with a regression gate.
+
+Builds a synthetic prepare_base.json (``benchmarks/synthetic_base.py``) of the
+requested size in a temp dir, runs ``run_sarimax_models.main`` on it --repeat
+times with every cache off, and reads the per-stage timings from the step's
+``perf`` block: full-sample fits, get_forecast calls, the recursive lag-12
+forecaster, Monte Carlo, the OOS stage, the ensemble weight search and the
+MC aggregation kernel. The best (min) wall time over the repeats is kept.
+The OOS stage runs in the step's own default oos_mode (refit, as in the
+pipeline); --oos-mode fixed_params gives a quick run without window refits.
+
+With --baseline, each stage is compared against a previous --json report and
+the script exits non-zero if any stage is slower by more than --threshold
+(relative) and --min-seconds (absolute, to ignore noise on tiny stages).
+Keep --max-workers at 1 for comparable numbers: with a pool, span times are
+summed across workers.
+
+Usage:
+    python benchmarks/bench_sarimax_step.py --json bench_step.json
+    python benchmarks/bench_sarimax_step.py --months 400 --horizon 48 --extra-exog 4 --models 3 4
+    python benchmarks/bench_sarimax_step.py --oos-mode fixed_params --oos-max-windows 6
+    python benchmarks/bench_sarimax_step.py --baseline bench_step.json --threshold 0.2
+"""
+import argparse
+import inspect
+import json
+import os
+import platform
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import statsmodels
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.synthetic_base import DEFAULT_MONTHS, build_synthetic_base  # noqa: E402
+from steps import run_sarimax_models  # noqa: E402
+from steps.run_sarimax_models import ALL_MODEL_SPECS, N_SIMULATIONS  # noqa: E402
+
+# Report stage -> perf span kind (summed over every step stage) or step stage
+SPAN_STAGES = {
+    "full_fit": "full_sample.fit",
+    "forecast": "full_sample.forecast",
+    "lag12_forecast": "full_sample.lag12_forecast",
+    "monte_carlo": "full_sample.monte_carlo",
+    "ensemble_search": ".ensemble_search",
+    "aggregation": ".aggregation",
+}
+STEP_STAGES = {"full_sample": "full_sample", "oos": "oos", "horizons": "horizons"}
+# Benchmark the OOS mode the pipeline runs unless told otherwise
+DEFAULT_OOS_MODE = inspect.signature(run_sarimax_models.main).parameters["oos_mode"].default
+
+
+def _stage_times(perf):
+    """{report stage: wall seconds} from a step perf block."""
+    times = {}
+    for stage, key in SPAN_STAGES.items():
+        times[stage] = sum(span["wall_s"] for name, span in perf["spans"].items()
+                           if (name.endswith(key) if key.startswith(".") else name == key))
+    for stage, key in STEP_STAGES.items():
+        times[f"stage.{stage}"] = perf["stages"].get(key, 0.0)
+    times["total"] = perf["wall_s"]
+    return {k: round(v, 4) for k, v in times.items()}
+
+
+def _run_step(workdir, args, repeat):
+    """One step run on the synthetic base in workdir; returns its perf block."""
+    horizons = [args.horizon] if args.horizon else None
+    out = run_sarimax_models.main(
+        output_dir=str(workdir), seed=args.seed + repeat, max_workers=args.max_workers,
+        oos_mode=args.oos_mode, oos_max_windows=args.oos_max_windows,
+        oos_cache=False, fit_cache=False, cache_dir=str(workdir / "cache"),
+        models_to_run=args.models, n_simulations=args.n_simulations, horizons=horizons,
+    )
+    if out.get("status") != "ok":
+        raise RuntimeError(out.get("message", "run_sarimax_models failed"))
+    return out["perf"]
+
+
+def _compare(stages, baseline, threshold, min_seconds):
+    """[(stage, base_s, now_s, ratio, regressed)] for stages present in both."""
+    rows = []
+    for stage, now in stages.items():
+        base = baseline.get(stage)
+        if base is None:
+            continue
+        ratio = now / base if base > 0 else float("inf") if now > 0 else 1.0
+        regressed = now > base * (1 + threshold) and now - base > min_seconds
+        rows.append((stage, base, now, ratio, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--months", type=int, default=DEFAULT_MONTHS,
+                        help="Synthetic ICMS history length from 2003-01")
+    parser.add_argument("--horizon", type=int, default=None,
+                        help="Forecast horizon in months (default: the step's short + long)")
+    parser.add_argument("--extra-exog", type=int, default=0,
+                        help="Extra AR(1) regressors appended to every selected spec")
+    parser.add_argument("--models", nargs="*", default=None,
+                        help="models_to_run for the step (default: all specs)")
+    parser.add_argument("--oos-mode", default=DEFAULT_OOS_MODE, choices=run_sarimax_models.OOS_MODES,
+                        help=f"OOS validation mode (default: the step's, {DEFAULT_OOS_MODE})")
+    parser.add_argument("--oos-max-windows", type=int, default=12)
+    parser.add_argument("--n-simulations", type=int, default=N_SIMULATIONS)
+    parser.add_argument("--max-workers", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage; the min is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Write the report to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Previous --json report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative slowdown that counts as a regression")
+    parser.add_argument("--min-seconds", type=float, default=0.05,
+                        help="Absolute slowdown below which a stage is never flagged")
+    args = parser.parse_args()
+
+    config = {k: getattr(args, k) for k in ("months", "horizon", "extra_exog", "models", "oos_mode",
+                                            "oos_max_windows", "n_simulations", "max_workers", "seed")}
+    extra_cols = [f"x{j}" for j in range(1, args.extra_exog + 1)]
+    saved_specs = dict(ALL_MODEL_SPECS)
+    runs = []
+    try:
+        # Specs are resolved in the parent and shipped to workers, so the
+        # patched copies reach the pool too
+        for name, spec in saved_specs.items():
+            ALL_MODEL_SPECS[name] = {**spec, "exog_cols": spec["exog_cols"] + extra_cols}
+        with tempfile.TemporaryDirectory(prefix="bench_sarimax_") as tmp:
+            workdir = Path(tmp)
+            base = build_synthetic_base(workdir, months=args.months, horizon=args.horizon,
+                                        extra_exog=args.extra_exog, seed=args.seed)
+            print(f"synthetic base: {len(base['train_data'])} train / "
+                  f"{len(base['future_data'])} future months, {len(extra_cols)} extra exog")
+            for repeat in range(args.repeat):
+                runs.append(_stage_times(_run_step(workdir, args, repeat)))
+    finally:
+        ALL_MODEL_SPECS.update(saved_specs)
+
+    stages = {stage: min(run[stage] for run in runs) for stage in runs[0]}
+    report = {
+        "config": config,
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "statsmodels": statsmodels.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "repeat": args.repeat,
+        "stages": stages,
+        "runs": runs,
+    }
+
+    regressions = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if baseline.get("config") != config:
+            print(f"WARNING: baseline config differs: {baseline.get('config')}")
+        rows = _compare(stages, baseline.get("stages", {}), args.threshold, args.min_seconds)
+        print(f"{'stage':<20} {'baseline (s)':>13} {'now (s)':>10} {'ratio':>7}")
+        for stage, base_s, now_s, ratio, regressed in rows:
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{stage:<20} {base_s:>13.3f} {now_s:>10.3f} {ratio:>6.2f}x{flag}")
+            if regressed:
+                regressions.append(stage)
+        report["baseline"] = {"path": args.baseline, "threshold": args.threshold,
+                              "min_seconds": args.min_seconds, "regressions": regressions}
+    else:
+        print(f"{'stage':<20} {'wall (s)':>10}")
+        for stage, wall in stages.items():
+            print(f"{stage:<20} {wall:>10.3f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    if regressions:
+        print(f"REGRESSION: {', '.join(regressions)} slower than baseline by > {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Synthetic prepare_base.json of configurable size for the SARIMAX benchmarks.
+
+Draws IBC-BR, IGP-DI and ICMS-SP series with the shape of the real data
+(trend, seasonality, AR noise, the 2008 level shift and the 2020 dip),
+writes them as fetch_macro_data.json / load_sefaz_data.json and runs the
+real ``steps.prepare_base`` on them, so lags, dummies, projections and the
+train/future split are exactly what the pipeline produces. No network or
+SEFAZ files needed.
+
+Size knobs: --months of ICMS history from 2003-01 (at least MIN_MONTHS, so
+every structural dummy takes both values), --horizon months of future rows
+(prepare_base builds the rest of the last year + the next one; longer
+horizons extend the projections with prepare_base's own formulas, lag-12
+left unknown) and --extra-exog AR(1) regressors x1..xK appended to every
+row for specs that use them.
+
+Usage:
+    python benchmarks/synthetic_base.py --output-dir /tmp/synth
+    python benchmarks/synthetic_base.py --output-dir /tmp/synth --months 400 --horizon 48 --extra-exog 4
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from steps import prepare_base  # noqa: E402
+
+START = pd.Timestamp("2003-01-01")
+# Through 2023-06: TC2022OUT05 (Oct/2022-May/2023) is observed in both states
+MIN_MONTHS = 246
+DEFAULT_MONTHS = 279
+DUMMY_COLS = ["LS2008NOV", "TC2020APR04", "TC2022OUT05"]
+
+
+def _ar1(rng, n, phi, sigma):
+    """Stationary AR(1) draw of length n."""
+    e = rng.normal(0.0, sigma, n)
+    x = np.empty(n)
+    x[0] = e[0] / np.sqrt(1 - phi ** 2)
+    for t in range(1, n):
+        x[t] = phi * x[t - 1] + e[t]
+    return x
+
+
+def _synthetic_upstream(months, seed):
+    """(fetch_macro_data, load_sefaz_data) dicts with `months` of history."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(START, periods=months, freq="MS")
+    t = np.arange(months)
+    month = dates.month.values
+    season = 0.03 * np.sin(2 * np.pi * (month - 3) / 12)
+
+    dip = np.where((dates.year == 2020) & (month >= 4) & (month <= 7), -0.12, 0.0)
+    log_ibc = np.log(67.5) + 0.0025 * t + season + dip + _ar1(rng, months, 0.6, 0.01)
+    log_igp = np.log(276.6) + np.cumsum(0.005 + rng.normal(0.0, 0.004, months))
+    dias = np.array([prepare_base._dias_uteis(d.year, d.month) for d in dates])
+    ls = (dates >= pd.Timestamp("2008-11-01")).astype(float)
+
+    log_icms = (0.9 * log_ibc + 0.85 * log_igp + 0.012 * dias + 0.04 * ls
+                + 0.5 * season + dip / 2 + _ar1(rng, months, 0.3, 0.02))
+    log_icms += np.log(3.4e9) - log_icms[0]
+
+    iso = dates.strftime("%Y-%m-%d")
+    macro = {
+        "ibc_br": [{"data": d, "ibc_br": round(float(v), 5)} for d, v in zip(iso, np.exp(log_ibc))],
+        "igp_di": [{"data": d, "igp_di": round(float(v), 3)} for d, v in zip(iso, np.exp(log_igp))],
+        "focus_expectations": {"PIB Total": 2.0, "IGP-M": 4.0},
+        "status": "ok",
+    }
+    sefaz = {
+        "icms_sp_series": [{"data": d, "icms_sp": float(v)} for d, v in zip(iso, np.exp(log_icms))],
+        "last_observed_date": iso[-1],
+        "n_observations": months,
+        "status": "ok",
+    }
+    return macro, sefaz
+
+
+def _extend_horizon(base, horizon):
+    """Append future rows until future_data holds `horizon` months."""
+    df = pd.DataFrame(base["base_data"])
+    df["data"] = pd.to_datetime(df["data"])
+    extra = horizon - len(base["future_data"])
+    new_dates = pd.date_range(df["data"].iloc[-1] + pd.DateOffset(months=1), periods=extra, freq="MS")
+    ext = pd.DataFrame({"data": new_dates, "ano": new_dates.year, "mes": new_dates.month})
+    ext["dias_uteis"] = [prepare_base._dias_uteis(d.year, d.month) for d in new_dates]
+    for col in DUMMY_COLS:
+        ext[col] = int(df[col].iloc[-1])
+
+    # Same projection formulas as prepare_base: IBC-BR trend x seasonal
+    # profile, IGP-DI at the calibrated (constant) monthly rate
+    ibc = base["projection"]["ibc_br"]
+    pib = base["scenario_params"]["pib_growth_pct"] / 100
+    ext["ibc_br"] = (ibc["base_annual_mean"] * (1 + pib) ** (new_dates.year - ibc["base_year"])
+                     * np.asarray(ibc["seasonal_factors"])[new_dates.month - 1])
+    igp = df["igp_di"].to_numpy(dtype=float)
+    rate = igp[-1] / igp[-2]
+    ext["igp_di"] = igp[-1] * rate ** np.arange(1, extra + 1)
+
+    df = pd.concat([df, ext], ignore_index=True)
+    for col in ["ibc_br", "igp_di", "dias_uteis"]:
+        for lag in range(1, 5):
+            df[f"{col}_lag{lag}"] = df[col].shift(lag)
+    df["log_icms_lag12"] = np.log(df["icms_sp"]).shift(12)
+    return df
+
+
+def _add_extra_exog(df, k, seed):
+    """Append AR(1) regressors x1..xk (no effect on ICMS, pure fit cost)."""
+    rng = np.random.default_rng([seed, k])
+    for j in range(1, k + 1):
+        df[f"x{j}"] = np.round(_ar1(rng, len(df), 0.7, 1.0), 6)
+    return df
+
+
+def build_synthetic_base(output_dir, months=DEFAULT_MONTHS, horizon=None, extra_exog=0, seed=0):
+    """Write a synthetic prepare_base.json (plus its upstream files) to output_dir.
+
+    Returns the prepare_base result dict. Raises ValueError if months is
+    below MIN_MONTHS.
+    """
+    if months < MIN_MONTHS:
+        raise ValueError(f"months must be at least {MIN_MONTHS} (through 2023-06), got {months}")
+    od = Path(output_dir)
+    od.mkdir(parents=True, exist_ok=True)
+    macro, sefaz = _synthetic_upstream(months, seed)
+    (od / "fetch_macro_data.json").write_text(json.dumps(macro), encoding="utf-8")
+    (od / "load_sefaz_data.json").write_text(json.dumps(sefaz), encoding="utf-8")
+    base = prepare_base.main(output_dir=str(od))
+    if (not horizon or horizon <= len(base["future_data"])) and not extra_exog:
+        return base
+
+    if horizon and horizon > len(base["future_data"]):
+        df = _extend_horizon(base, horizon)
+    else:
+        df = pd.DataFrame(base["base_data"])
+        df["data"] = pd.to_datetime(df["data"])
+    df = _add_extra_exog(df, extra_exog, seed)
+
+    last_icms_date = df.loc[df["icms_sp"].notna(), "data"].max()
+
+    def df_to_records(frame):
+        frame = frame.copy()
+        frame["data"] = frame["data"].dt.strftime("%Y-%m-%d")
+        return frame.replace({np.nan: None}).to_dict(orient="records")
+
+    base.update({
+        "base_data": df_to_records(df),
+        "train_data": df_to_records(df[df["data"] <= last_icms_date]),
+        "future_data": df_to_records(df[df["data"] > last_icms_date]),
+        "n_columns": len(df.columns),
+        "n_rows": len(df),
+        "horizon_end": int(df["data"].iloc[-1].year),
+    })
+    (od / "prepare_base.json").write_text(json.dumps(base, ensure_ascii=False), encoding="utf-8")
+    return base
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output-dir", required=True, help="Dir to write prepare_base.json into")
+    parser.add_argument("--months", type=int, default=DEFAULT_MONTHS,
+                        help=f"ICMS history length from 2003-01 (min {MIN_MONTHS})")
+    parser.add_argument("--horizon", type=int, default=None,
+                        help="Minimum future months (default: prepare_base's rest of year + next)")
+    parser.add_argument("--extra-exog", type=int, default=0, help="Extra AR(1) regressors x1..xK")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    base = build_synthetic_base(args.output_dir, months=args.months, horizon=args.horizon,
+                                extra_exog=args.extra_exog, seed=args.seed)
+    print(f"{len(base['train_data'])} train / {len(base['future_data'])} future months, "
+          f"{base['n_columns']} columns -> {Path(args.output_dir) / 'prepare_base.json'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -918,6 +918,14 @@ def run_pipeline(
                 else:
                     ledger.emit("validation_pass", step_id=step_id)
 
+            # Step-reported timing spans (e.g. run_sarimax_models "perf"), one event each
+            perf = output_for_gate.get("perf") if isinstance(output_for_gate, dict) else None
+            if isinstance(perf, dict):
+                for stage, wall_s in perf.get("stages", {}).items():
+                    ledger.emit("step_perf", step_id=step_id, span=f"stage.{stage}", wall_s=wall_s)
+                for span, stats in perf.get("spans", {}).items():
+                    ledger.emit("step_perf", step_id=step_id, span=span, **stats)
+
             # Step succeeded
             ledger.emit("step_done", step_id=step_id, duration_s=round(elapsed, 1), cost_usd=step_cost)
             state.mark_done(step_id, duration_s=elapsed, cost_usd=step_cost)
@@ -10,7 +10,8 @@ Charts produced:
   Matplotlib (static PNG for academic report):
     1. forecast_comparison
     2. diagnostics_heatmap
-    3. residual_diagnostics — 2x2 per best model: series, histogram, ACF, Q-Q
+    3. residual_diagnostics — 2x2 for the best candidate (model or ensemble):
+       series, histogram, ACF, Q-Q; residuals from fitted_models.npz
     4. fan_chart_static — historical + forecast with CI bands
 """
 import json
@@ -527,11 +528,45 @@ def _generate_static_charts(sarimax_results: dict, output_dir: Path, base_data:
     return charts
 
 
+def _load_residuals(output_dir: Path, sarimax_results: dict, name: str):
+    """In-sample residuals of a model or ensemble from the fitted-model artifact.
+
+    Individual models read their residuals from fitted_models.npz (written
+    by run_sarimax_models, no refit), minus the first loglikelihood_burn
+    ones: diffuse-initialization residuals are not forecast errors (the
+    first is the level of the series itself) and would swamp the plots.
+    An ensemble combines its components' residuals with the ensemble
+    weights over their common dates. Returns a date-indexed Series, or None
+    when the artifact or the model is missing.
+    """
+    ref = sarimax_results.get("fitted_models") or {}
+    models = ref.get("models", {})
+    path = output_dir / ref.get("file", "fitted_models.npz")
+    if not models or not path.exists():
+        return None
+
+    candidate = _get_all_candidates(sarimax_results).get(name, {})
+    weights = candidate.get("weights") or {name: 1.0}
+    if not all(m in models for m in weights):
+        return None
+
+    with np.load(path) as npz:
+        series = {}
+        for m in weights:
+            prefix, burn = models[m]["prefix"], int(models[m].get("loglikelihood_burn", 0))
+            series[m] = pd.Series(npz[f"{prefix}_resid"][burn:],
+                                  index=pd.DatetimeIndex(npz[f"{prefix}_dates"][burn:]))
+    total = sum(weights.values())
+    resid = sum(w / total * series[m] for m, w in weights.items())
+    return resid.dropna()
+
+
 def _generate_residual_diagnostics(sarimax_results: dict, output_dir: Path, charts_dir: Path) -> dict:
     """Generate residual diagnostics: series, histogram, ACF, Q-Q plot.
 
-    Refits the best model to extract residuals (the JSON output does not store
-    raw residual arrays — only summary diagnostics).
+    Residuals of the best candidate come from the fitted-model artifact of
+    run_sarimax_models; for an ensemble they are the weighted combination of
+    its components' residuals.
     """
     import matplotlib
     matplotlib.use("Agg")
@@ -543,68 +578,14 @@ def _generate_residual_diagnostics(sarimax_results: dict, output_dir: Path, char
     if not best_model:
         return charts
 
-    # Load training data and refit the best model to get residuals
-    base = _load(output_dir, "prepare_base")
-    train_records = base.get("train_data", [])
-    if not train_records:
-        return charts
-
     try:
-        from statsmodels.tsa.statespace.sarimax import SARIMAX
         from statsmodels.graphics.tsaplots import plot_acf
         from scipy import stats as sp_stats
     except ImportError:
         return charts
 
-    # Import model specs (inline to avoid circular deps)
-    MODEL_SPECS = {
-        "Modelo 1": {
-            "order": (1, 1, 1), "seasonal_order": (0, 0, 0, 12),
-            "exog_cols": ["dias_uteis", "LS2008NOV", "TC2020APR04", "TC2022OUT05"],
-        },
-        "Modelo 2": {
-            "order": (3, 1, 0), "seasonal_order": (2, 0, 0, 12),
-            "exog_cols": ["igp_di_lag1", "ibc_br_lag1", "dias_uteis", "LS2008NOV", "TC2020APR04", "TC2022OUT05"],
-        },
-        "Modelo 3": {
-            "order": (0, 1, 1), "seasonal_order": (0, 1, 1, 12),
-            "exog_cols": ["igp_di", "ibc_br", "ibc_br_lag1", "dias_uteis", "LS2008NOV", "TC2020APR04", "TC2022OUT05"],
-        },
-        "Modelo 4": {
-            "order": (0, 1, 1), "seasonal_order": (0, 1, 2, 12),
-            "exog_cols": ["ibc_br", "ibc_br_lag1", "dias_uteis", "LS2008NOV", "TC2020APR04", "TC2022OUT05"],
-        },
-        "Modelo 5": {
-            "order": (0, 1, 1), "seasonal_order": (0, 1, 2, 12),
-            "exog_cols": ["igp_di", "ibc_br", "ibc_br_lag1", "LS2008NOV", "TC2020APR04", "TC2022OUT05"],
-        },
-    }
-
-    spec = MODEL_SPECS.get(best_model)
-    if not spec:
-        return charts
-
-    try:
-        train_df = pd.DataFrame(train_records)
-        train_df["data"] = pd.to_datetime(train_df["data"])
-        y = np.log(train_df["icms_sp"].astype(float))
-        X = train_df[spec["exog_cols"]].astype(float)
-
-        # Contiguous slice (same logic as run_sarimax_models._fit_model)
-        valid = X.notna().all(axis=1) & y.notna()
-        first_valid = valid.idxmax()
-        y_clean = y.loc[first_valid:].copy().ffill()
-        X_clean = X.loc[first_valid:].copy().ffill()
-        both_valid = X_clean.notna().all(axis=1) & y_clean.notna()
-        y_clean = y_clean[both_valid]
-        X_clean = X_clean[both_valid]
-
-        model = SARIMAX(y_clean, exog=X_clean,
-                        order=spec["order"], seasonal_order=spec["seasonal_order"],
-                        enforce_stationarity=False, enforce_invertibility=False)
-        result = model.fit(disp=False)
-        resid = result.resid.dropna()
-    except Exception:
+    resid = _load_residuals(output_dir, sarimax_results, best_model)
+    if resid is None:
         return charts
 
     if len(resid) < 20:
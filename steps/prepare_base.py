@@ -188,6 +188,23 @@ def main(*, output_dir: str = "", **kwargs) -> dict:
             "igpm_growth_pct": round(igpm_growth * 100, 2),
             "source": "Focus consensus" if not pib_override else "user override",
         },
+        # Calibration of the IBC-BR / IGP-DI projections above, so downstream
+        # steps can rebuild them for other growth rates (scenario sweeps)
+        "projection": {
+            "ibc_br": {
+                "last_observed": last_ibc_date.strftime("%Y-%m-%d"),
+                "base_year": int(last_obs_year - 1),
+                "base_annual_mean": float(base_annual_mean),
+                "seasonal_factors": [float(f) for f in seasonal_factors],
+            },
+            "igp_di": {
+                "last_observed": last_igp_date.strftime("%Y-%m-%d"),
+                "last_value": float(last_igp),
+                "dec_prev": float(igp_dec_prev) if dec_prev_mask.any() else None,
+                "target_dec": target_dec.strftime("%Y-%m-%d"),
+                "target_years": int(target_dec.year - last_obs_year_igp + 1),
+            },
+        },
         "status": "ok"
     }
 
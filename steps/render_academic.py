@@ -21,7 +21,17 @@ def main(*, output_dir: str = "", template_name: str = "", **kwargs) -> dict:
     validation = _load(od, "validate_forecasts")
 
     # If horizons exist, overlay horizon-specific fields on top of sarimax
-    hz_data = sarimax.get("horizons", {}).get(horizon_key, {})
+    horizons = sarimax.get("horizons")
+    hz_data = (horizons or {}).get(horizon_key, {})
+    # Runs without a horizons block predate multi-horizon output: top-level only
+    if horizons is not None and horizon_key not in horizons:
+        return {"status": "error",
+                "message": f"Horizon '{horizon_key}' was not computed by run_sarimax_models "
+                           f"(available: {', '.join(horizons) or 'none'}); add it to its horizons"}
+    if not hz_data.get("materialized", True):
+        return {"status": "error",
+                "message": f"Horizon '{horizon_key}' was ranked but not materialized; "
+                           f"add it to run_sarimax_models materialize_horizons"}
 
     static_charts = charts.get("static_charts", {})
     models = sarimax.get("models", {})
@@ -5,12 +5,37 @@ import re
 from datetime import datetime, date
 from pathlib import Path
 
+import numpy as np
+
 
 def _load(od: Path, name: str) -> dict:
     f = od / f"{name}.json"
     return json.loads(f.read_text()) if f.exists() else {}
 
 
+def _load_mc_annual_paths(od: Path, sarimax: dict, hz_data: dict) -> dict:
+    """Per-model annual MC path sums (R$ bi): {model: {year: [sims]}}.
+
+    Reads the float32 sidecar referenced by sarimax["mc_paths"] memory-mapped;
+    runs from before the sidecar carried the lists in the JSON itself.
+    """
+    ref = sarimax.get("mc_paths")
+    if not ref:
+        return hz_data.get("mc_annual_paths", sarimax.get("mc_annual_paths", {}))
+    f = od / ref["file"]
+    if not f.exists():
+        return {}
+    paths = np.load(f, mmap_mode="r")
+    months_year = np.array([m[:4] for m in ref["months"]])
+    years = sorted(set(months_year))
+    indicator = (months_year[:, None] == np.array(years)[None, :]).astype(np.float64)
+    annual_bi = np.round(np.matmul(paths, indicator) / 1e9, 2)  # (models, sims, years)
+    return {
+        name: {yr: annual_bi[i, :, j].tolist() for j, yr in enumerate(years)}
+        for i, name in enumerate(ref["models"])
+    }
+
+
 def _fmt_brl(value_raw: float, unit: str = "bi") -> str:
     """Format a number as R$ with thousands separators.
 
@@ -1405,16 +1430,25 @@ def main(*, output_dir: str = "", template_name: str = "", **kwargs) -> dict:
     cross_validate = _load(od, "cross_validate_r")
 
     # Overlay horizon-specific fields on top of sarimax data
-    hz_data = sarimax_raw.get("horizons", {}).get(horizon_key, {})
+    horizons = sarimax_raw.get("horizons")
+    hz_data = (horizons or {}).get(horizon_key, {})
+    # Runs without a horizons block predate multi-horizon output: top-level only
+    if horizons is not None and horizon_key not in horizons:
+        return {"status": "error",
+                "message": f"Horizon '{horizon_key}' was not computed by run_sarimax_models "
+                           f"(available: {', '.join(horizons) or 'none'}); add it to its horizons"}
+    if not hz_data.get("materialized", True):
+        return {"status": "error",
+                "message": f"Horizon '{horizon_key}' was ranked but not materialized; "
+                           f"add it to run_sarimax_models materialize_horizons"}
     sarimax = dict(sarimax_raw)
     for key in ["all_candidates", "best_model", "best_model_mape", "annual_totals",
                  "ensemble_mean", "ensemble_weighting", "confidence_intervals",
-                 "top5_ensembles", "forecast_horizon"]:
+                 "top5_ensembles", "forecast_horizon", "oos_mode"]:
         if key in hz_data:
             sarimax[key] = hz_data[key]
-    # MC paths from horizon if available
-    if "mc_annual_paths" in hz_data:
-        sarimax["mc_annual_paths"] = hz_data["mc_annual_paths"]
+    # MC annual paths (memory-mapped sidecar; legacy runs embed them per horizon)
+    sarimax["mc_annual_paths"] = _load_mc_annual_paths(od, sarimax_raw, hz_data)
 
     plotly_charts = charts.get("plotly_charts", {})
 
@@ -1434,6 +1468,8 @@ def main(*, output_dir: str = "", template_name: str = "", **kwargs) -> dict:
     best_candidate_mape = sarimax.get("best_model_mape", "N/A")
     if isinstance(best_candidate_mape, (int, float)):
         best_candidate_mape = f"{best_candidate_mape:.2f}"
+    # OOS MAPEs from fixed full-sample parameters are a screening estimate
+    oos_mode_note = ", OOS com parâmetros fixos" if sarimax.get("oos_mode") == "fixed_params" else ""
     diagnostics = sarimax.get("diagnostics", {})
     n_models = sarimax.get("n_models_fitted", 0)
 
@@ -1652,7 +1688,7 @@ def main(*, output_dir: str = "", template_name: str = "", **kwargs) -> dict:
         <div class="header-meta">
             <span>Gerado em: {now_str}</span>
             <span>{n_models} modelos SARIMAX</span>
-            <span>Melhor: {best_model} (MAPE {best_candidate_mape}%)</span>
+            <span>Melhor: {best_model} (MAPE {best_candidate_mape}%{oos_mode_note})</span>
         </div>
     </header>
 
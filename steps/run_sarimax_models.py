@@ -1,12 +1,26 @@
 """Fit 5 SARIMAX models, produce forecasts, Monte Carlo simulations, and diagnostics."""
+import hashlib
+import inspect
 import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import re
+import time
+import zlib
 import numpy as np
 import pandas as pd
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
 from itertools import combinations
+from multiprocessing import shared_memory
 from pathlib import Path
 import warnings
 warnings.filterwarnings("ignore")
 
+import statsmodels
+from scipy.stats import norm, qmc
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 from statsmodels.stats.diagnostic import acorr_ljungbox
 from statsmodels.tsa.stattools import adfuller
@@ -14,11 +28,39 @@ from statsmodels.tsa.stattools import adfuller
 # Monte Carlo configuration
 N_SIMULATIONS = 1000
 MC_PERCENTILES = [5, 25, 50, 75, 95]
+MC_ANNUAL_KEYS = {5: "low_95", 25: "low_50", 50: "median", 75: "high_50", 95: "high_95"}
+MC_PATHS_FILE = "mc_paths.npy"  # float32 (models, sims, months) sidecar in output_dir
+FITTED_MODELS_FILE = "fitted_models.npz"  # per-model fit artifact in output_dir
+# Adaptive Monte Carlo (mc_adaptive): batches of paths until the annual
+# p5/p50/p95 move less than the tolerance (relative) between batches
+MC_BATCH_SIZE = 250
+MC_MAX_SIMULATIONS = 5000
+MC_TOLERANCE = 0.002
+MC_CONVERGENCE_PERCENTILES = [5, 50, 95]
+# Shock generators (mc_sampler): plain pseudo-random, antithetic pairs,
+# scrambled quasi-random points mapped through the normal inverse CDF, or
+# resampled standardized residuals (iid or moving-block bootstrap)
+MC_SAMPLERS = ("normal", "antithetic", "sobol", "halton", "bootstrap", "block_bootstrap")
+MC_BLOCK_LENGTH = 12  # months per block for block_bootstrap
+# QMC samplers run as independently scrambled replicates (Sobol replicates
+# sized to a power of 2), so the batch-means SE is a randomized-QMC estimate
+QMC_SAMPLERS = ("sobol", "halton")
+MC_QMC_REPLICATES = 8
 
 # OOS validation configuration
 DUMMY_COLS = ["LS2008NOV", "TC2020APR04", "TC2022OUT05"]
 MIN_TRAIN_MONTHS = 120  # 10 years minimum training for robust ARIMA
 MIN_OOS_WINDOWS = 10    # minimum expanding windows for reliable MAPE
+MAX_OOS_WINDOWS = 40    # default cap on evenly spaced cutoffs per horizon (0 = every month)
+OOS_STORE_VERSION = 3   # bump to invalidate persisted OOS windows
+OOS_WARM_START_MODES = ("none", "full_sample", "previous_cutoff")
+OOS_MODES = ("refit", "fixed_params")
+FIT_CACHE_VERSION = 1     # bump to invalidate cached full-sample fits
+FIT_CACHE_MAX_MB = 256    # LRU size bound of the fit cache
+
+# Timing spans (_perf_span) of this process, aggregated by "<stage>.<kind>";
+# pool tasks ship theirs back with each result (_perf_task)
+_PERF = {"stage": "main", "spans": {}, "stages": {}}
 
 
 def _to_python(obj):
@@ -138,12 +180,349 @@ MODEL_SPECS_PRIME = {
 ALL_MODEL_SPECS = {**MODEL_SPECS, **MODEL_SPECS_PRIME}
 
 
-def _fit_model(y, X, order, seasonal_order):
+def _select_model_names(models_to_run=None):
+    """Spec names selected by models_to_run, in ALL_MODEL_SPECS order (None = all).
+
+    A model reference -- 3, "3", "M3" or "Modelo 3" (case-insensitive) --
+    selects the original spec and its prime re-specification; the primed
+    forms ("3'", "M3'", "Modelo 3'") select only the prime. Raises
+    ValueError for entries that name no spec.
+    """
+    if not models_to_run:
+        return list(ALL_MODEL_SPECS)
+    if isinstance(models_to_run, (str, int)):
+        models_to_run = [models_to_run]
+    wanted, unknown = set(), []
+    for item in models_to_run:
+        match = re.fullmatch(r"(?:modelo|m)?\s*(\d+)\s*(')?", str(item).strip(), re.IGNORECASE)
+        names = []
+        if match:
+            number, prime = match.groups()
+            names = [n for n in (f"Modelo {number}'", None if prime else f"Modelo {number}")
+                     if n in ALL_MODEL_SPECS]
+        if not names:
+            unknown.append(item)
+        wanted.update(names)
+    if unknown:
+        raise ValueError(f"unknown models {unknown!r}; "
+                         f"expected numbers or names of {list(ALL_MODEL_SPECS)}")
+    return [name for name in ALL_MODEL_SPECS if name in wanted]
+
+
+def _resolve_horizons(horizons, short_months, long_months, max_months=None):
+    """{key: months} for the horizons step arg, in request order (None = short + long).
+
+    Entries are whole month counts or the names "short" (rest of the current
+    year, at least 1 month: after a December observation it is the next
+    month, as the OOS horizon fallback always had it) and "long" (short +
+    next full year). Counts equal to a named horizon keep its name; any
+    other count is keyed "<n>m". Raises ValueError on non-integer or
+    non-positive entries and on horizons longer than max_months (the future
+    block available to forecast).
+    """
+    named = {"short": max(1, short_months), "long": long_months}
+    if not horizons:
+        horizons = list(named)
+    elif isinstance(horizons, (str, int, float)):
+        horizons = [horizons]
+    resolved = {}
+    for item in horizons:
+        if isinstance(item, str) and item in named:
+            months = named[item]
+        elif isinstance(item, bool) or not isinstance(item, (int, float, str)):
+            raise ValueError(f"horizon must be a month count or 'short'/'long', got {item!r}")
+        else:
+            try:
+                value = float(item)
+            except ValueError:
+                raise ValueError(f"horizon must be a month count or 'short'/'long', got {item!r}")
+            if not value.is_integer():
+                raise ValueError(f"horizon must be a whole number of months, got {item!r}")
+            months = int(value)
+        if months < 1:
+            raise ValueError(f"horizon must be at least 1 month, got {item!r}")
+        if max_months is not None and months > max_months:
+            raise ValueError(f"horizon of {months} months exceeds the {max_months}-month "
+                             f"future block; extend prepare_base horizon_end")
+        key = next((k for k, m in named.items() if m == months), f"{months}m")
+        resolved.setdefault(key, months)
+    return resolved
+
+
+def _model_seed(base_seed, name):
+    """Per-model MC seed derived from the run seed and the model name.
+
+    Independent of scheduling order, so serial and process-pool runs draw
+    exactly the same paths for each model.
+    """
+    return np.random.SeedSequence([base_seed, zlib.crc32(name.encode("utf-8"))])
+
+
+def _process_pool(max_workers, initializer=None, initargs=()):
+    """Process pool for CPU-bound fits.
+
+    Uses the 'spawn' start method on every platform: the step runs inside the
+    runner's timeout thread, and forking a threaded process is unsafe.
+    """
+    return ProcessPoolExecutor(max_workers=max_workers,
+                               mp_context=multiprocessing.get_context("spawn"),
+                               initializer=initializer, initargs=initargs)
+
+
+def _iter_call(fn, *args):
+    """fn(*args) as a one-item generator (a single-item _run_timed_tasks task)."""
+    yield fn(*args)
+
+
+def _timed_worker(conn, initializer, initargs):
+    """_run_timed_tasks worker: run generator tasks, sending back each item as produced."""
+    if initializer is not None:
+        initializer(*initargs)
+    conn.send(("ready", None, None))
+    while True:
+        task = conn.recv()
+        if task is None:
+            return
+        fn, stage, args = task
+        _PERF["stage"] = stage
+        for item in fn(*args):
+            conn.send(("item", item, _perf_drain()))
+        conn.send(("done", None, None))
+
+
+def _run_timed_tasks(tasks, max_workers, timeout, initializer=None, initargs=(), resume=None,
+                     timed_items=None):
+    """Run generator tasks on killable worker processes with a per-item time budget.
+
+    tasks is a list of (fn, args, n_items) where fn(*args) yields n_items
+    results (e.g. one per fit). A worker that yields nothing for `timeout`
+    seconds is killed and replaced: its pending item is left None and
+    recorded as timed out, and the task goes on from the next item with
+    resume(args, n_done, last_item) (None ends it; later items stay None).
+    A worker that dies is handled the same way without the timeout record;
+    one that dies before taking a task (e.g. in initializer) fails the next
+    queued task's first item.
+    With timed_items, only each task's first timed_items items have the
+    budget; the rest run unbounded. Workers use the spawn start method,
+    like _process_pool.
+
+    Returns (results, timed_out): per task the list of its items, and
+    {task index: [timed-out item indices]}.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    stage = _PERF["stage"]
+    results = [[None] * n_items for _, _, n_items in tasks]
+    last_item = [None] * len(tasks)
+    timed_out = {}
+    queue = deque((t, args, 0) for t, (_, args, _) in enumerate(tasks))
+
+    def spawn():
+        conn, child = ctx.Pipe()
+        proc = ctx.Process(target=_timed_worker, args=(child, initializer, initargs),
+                           daemon=True)
+        proc.start()
+        child.close()
+        return {"proc": proc, "conn": conn, "ready": False, "job": None, "deadline": None}
+
+    def replace(worker, timed):
+        # Kill the worker mid-item, skip that item and requeue the rest of its task
+        worker["proc"].kill()
+        worker["proc"].join()
+        worker["conn"].close()
+        if worker["job"] is None:
+            # Died idle: charge the next queued task, so a worker that keeps
+            # failing at startup still drains the queue; retire it if empty
+            if not queue:
+                return None
+            worker["job"] = [*queue.popleft(), 0]
+        t, args, offset, n_done = worker["job"]
+        if timed:
+            timed_out.setdefault(t, []).append(offset + n_done)
+        if resume is not None and offset + n_done + 1 < len(results[t]):
+            rest = resume(args, n_done + 1, last_item[t])
+            if rest is not None:
+                queue.appendleft((t, rest, offset + n_done + 1))
+        return spawn()
+
+    workers = [spawn() for _ in range(max(1, min(max_workers, len(queue))))] if queue else []
+    try:
+        while queue or any(w["job"] is not None for w in workers):
+            now = time.perf_counter()
+            for w in workers:
+                if w["ready"] and w["job"] is None and queue:
+                    t, args, offset = queue.popleft()
+                    w["conn"].send((tasks[t][0], stage, args))
+                    w["job"], w["deadline"] = [t, args, offset, 0], now + timeout
+            deadlines = [w["deadline"] for w in workers
+                         if w["job"] is not None and w["deadline"] is not None]
+            ready = multiprocessing.connection.wait(
+                [w["conn"] for w in workers],
+                timeout=max(0.0, min(deadlines) - now) if deadlines else None)
+            now = time.perf_counter()
+            for i, w in enumerate(workers):
+                if w["conn"] not in ready:
+                    if (w["job"] is not None and w["deadline"] is not None
+                            and now >= w["deadline"]):
+                        workers[i] = replace(w, timed=True)
+                    continue
+                try:
+                    kind, item, spans = w["conn"].recv()
+                except (EOFError, OSError):
+                    workers[i] = replace(w, timed=False)
+                    continue
+                if kind == "ready":
+                    w["ready"] = True
+                elif kind == "item":
+                    _perf_merge(spans)
+                    t, _, offset, n_done = w["job"]
+                    results[t][offset + n_done] = item
+                    if item is not None:
+                        last_item[t] = item
+                    w["job"][3] += 1
+                    w["deadline"] = (now + timeout if timed_items is None
+                                     or offset + n_done + 1 < timed_items else None)
+                else:
+                    w["job"] = None
+            workers = [w for w in workers if w is not None]
+    finally:
+        for w in filter(None, workers):
+            try:
+                w["conn"].send(None)
+            except (OSError, ValueError):
+                pass
+            w["proc"].join(timeout=5)
+            if w["proc"].is_alive():
+                w["proc"].kill()
+            w["conn"].close()
+    return results, timed_out
+
+
+def _perf_new_span():
+    return {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "max_wall_s": 0.0, "iterations": 0,
+            "not_converged": 0, "cache_hits": 0, "paths": 0, "fallbacks": 0, "warnings": {}}
+
+
+@contextmanager
+def _perf_span(kind):
+    """Time one call into the current stage's `kind` span (wall and CPU seconds).
+
+    Yields a dict the caller may fill with "iterations", "converged",
+    "cache_hit", "paths" or "fallback". Warnings raised inside are counted by category
+    -- statsmodels' ConvergenceWarning included, despite the module filter.
+    """
+    info = {}
+    t_wall, t_cpu = time.perf_counter(), time.process_time()
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        try:
+            yield info
+        finally:
+            wall = time.perf_counter() - t_wall
+            span = _PERF["spans"].setdefault(f"{_PERF['stage']}.{kind}", _perf_new_span())
+            span["calls"] += 1
+            span["wall_s"] += wall
+            span["cpu_s"] += time.process_time() - t_cpu
+            span["max_wall_s"] = max(span["max_wall_s"], wall)
+            span["iterations"] += int(info.get("iterations") or 0)
+            span["not_converged"] += info.get("converged") is False
+            span["cache_hits"] += bool(info.get("cache_hit"))
+            span["paths"] += int(info.get("paths") or 0)
+            span["fallbacks"] += bool(info.get("fallback"))
+            for w in caught:
+                category = w.category.__name__
+                span["warnings"][category] = span["warnings"].get(category, 0) + 1
+
+
+@contextmanager
+def _perf_stage(name):
+    """Tag the spans recorded inside with `name` and add its wall time to the stage totals."""
+    prev, t0 = _PERF["stage"], time.perf_counter()
+    _PERF["stage"] = name
+    try:
+        yield
+    finally:
+        _PERF["stage"] = prev
+        _PERF["stages"][name] = _PERF["stages"].get(name, 0.0) + time.perf_counter() - t0
+
+
+def _perf_drain():
+    """Spans recorded by this process since the last drain (and reset them)."""
+    spans, _PERF["spans"] = _PERF["spans"], {}
+    return spans
+
+
+def _perf_merge(spans):
+    """Add spans drained in another process into this one's."""
+    for key, other in spans.items():
+        span = _PERF["spans"].setdefault(key, _perf_new_span())
+        for field in ("calls", "wall_s", "cpu_s", "iterations", "not_converged",
+                      "cache_hits", "paths", "fallbacks"):
+            span[field] += other[field]
+        span["max_wall_s"] = max(span["max_wall_s"], other["max_wall_s"])
+        for category, n in other["warnings"].items():
+            span["warnings"][category] = span["warnings"].get(category, 0) + n
+
+
+def _perf_task(fn, stage, *args):
+    """Pool task wrapper: run fn(*args) under `stage`; returns (result, drained spans)."""
+    prev = _PERF["stage"]
+    _PERF["stage"] = stage
+    try:
+        return fn(*args), _perf_drain()
+    finally:
+        _PERF["stage"] = prev
+
+
+def _perf_result(out):
+    """Unwrap a _perf_task result, merging its spans into this process."""
+    result, spans = out
+    _perf_merge(spans)
+    return result
+
+
+def _perf_summary(spans, stages, wall, cpu):
+    """perf output block: step wall/CPU, per-stage wall and per-span totals."""
+    summary = {}
+    for key, span in sorted(spans.items(), key=lambda kv: -kv[1]["wall_s"]):
+        entry = {
+            "calls": span["calls"],
+            "wall_s": round(span["wall_s"], 3),
+            "cpu_s": round(span["cpu_s"], 3),
+            "mean_wall_s": round(span["wall_s"] / span["calls"], 4),
+            "max_wall_s": round(span["max_wall_s"], 4),
+        }
+        if span["iterations"]:
+            entry["iterations"] = span["iterations"]
+        for field in ("not_converged", "cache_hits", "paths", "fallbacks"):
+            if span[field]:
+                entry[field] = span[field]
+        if span["warnings"]:
+            entry["warnings"] = dict(span["warnings"])
+        summary[key] = entry
+    return {
+        "wall_s": round(wall, 2),
+        "cpu_s": round(cpu, 2),
+        "stages": {name: round(sec, 2) for name, sec in stages.items()},
+        "spans": summary,
+    }
+
+
+def _fit_model(y, X, order, seasonal_order, params=None, start_params=None, maxiter=None,
+               cache_dir=None, cache_stats=None):
     """Fit a single SARIMAX model.
 
     Instead of boolean-masking (which can create gaps in the time series and
     confuse SARIMAX / Ljung-Box), we find the first row where all columns are
     valid and slice from there — preserving a contiguous series.
+
+    If params is given, the model is only filtered at those parameters
+    (no MLE). start_params warm-starts the optimizer (ignored if it does not
+    match the model's parameter count); maxiter overrides the default budget.
+
+    With cache_dir set, an MLE fit is first looked up in the fit cache
+    (_fit_cache_key); a hit rebuilds the results by smoothing at the cached
+    parameters, exactly as fit() does after optimising. cache_stats, if
+    given, counts "hits" and "misses".
     """
     valid = X.notna().all(axis=1) & y.notna()
     # Find the first valid index and take everything from there.
@@ -163,32 +542,842 @@ def _fit_model(y, X, order, seasonal_order):
 
     model = SARIMAX(y_clean, exog=X_clean, order=order, seasonal_order=seasonal_order,
                     enforce_stationarity=False, enforce_invertibility=False)
-    result = model.fit(disp=False)
+    if params is not None:
+        with _perf_span("filter"):
+            return model.filter(np.asarray(params, dtype=float))
+    fit_kwargs = {}
+    if start_params is not None and len(start_params) == model.k_params:
+        fit_kwargs["start_params"] = np.asarray(start_params, dtype=float)
+    if maxiter:
+        fit_kwargs["maxiter"] = int(maxiter)
+
+    key = None
+    if cache_dir is not None:
+        key = _fit_cache_key(order, seasonal_order, y_clean, X_clean, fit_kwargs)
+        entry = _read_fit_cache(cache_dir, key)
+        if entry is not None:
+            with _perf_span("fit") as span:
+                span["cache_hit"] = True
+                result = model.smooth(np.asarray(entry["params"], dtype=float))
+            result._results.mle_retvals = entry["mle_retvals"]
+            if cache_stats is not None:
+                cache_stats["hits"] = cache_stats.get("hits", 0) + 1
+            return result
+
+    with _perf_span("fit") as span:
+        result = model.fit(disp=False, **fit_kwargs)
+        retvals = getattr(result, "mle_retvals", None) or {}
+        span["iterations"] = retvals.get("iterations")
+        span["converged"] = retvals.get("converged")
+    if key is not None:
+        retvals = getattr(result, "mle_retvals", None) or {}
+        _write_fit_cache(cache_dir, key, {
+            "params": np.asarray(result.params, dtype=float),
+            "mle_retvals": {k: retvals.get(k) for k in ("converged", "iterations", "fopt")},
+        })
+        if cache_stats is not None:
+            cache_stats["misses"] = cache_stats.get("misses", 0) + 1
     return result
 
 
-def _run_monte_carlo(fitted_result, n_steps, exog_future, n_simulations=N_SIMULATIONS):
+def _fit_cache_key(order, seasonal_order, y, X, fit_kwargs):
+    """Content hash of a full MLE fit: spec, y, exog matrix, fit options, statsmodels."""
+    h = hashlib.sha256()
+    h.update(json.dumps({
+        "version": FIT_CACHE_VERSION,
+        "statsmodels": statsmodels.__version__,
+        "order": list(order),
+        "seasonal_order": list(seasonal_order),
+        "exog_cols": list(X.columns),
+        "fit_kwargs": {k: np.asarray(v).tolist() for k, v in sorted(fit_kwargs.items())},
+    }, sort_keys=True).encode("utf-8"))
+    h.update(np.ascontiguousarray(y, dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(X, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+def _read_fit_cache(cache_dir, key):
+    """Cached fit for key (touching it for LRU), or None if absent/unreadable."""
+    path = Path(cache_dir) / key[:2] / f"{key}.json"
+    try:
+        entry = json.loads(path.read_text(encoding="utf-8"))
+        os.utime(path)
+        return entry
+    except (OSError, ValueError):
+        return None
+
+
+def _write_fit_cache(cache_dir, key, entry):
+    """Persist one fit (atomic replace; failures only cost a refit next run)."""
+    path = Path(cache_dir) / key[:2] / f"{key}.json"
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(entry, cls=_NumpyEncoder), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _evict_fit_cache(cache_dir, max_bytes):
+    """Drop least recently used fits until the cache fits in max_bytes.
+
+    Returns (n_evicted, size_bytes after eviction).
+    """
+    files = []
+    for path in Path(cache_dir).glob("*/*.json"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        files.append((st.st_mtime, st.st_size, path))
+    size = sum(f[1] for f in files)
+    n_evicted = 0
+    for _, nbytes, path in sorted(files, key=lambda f: f[0]):
+        if size <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        size -= nbytes
+        n_evicted += 1
+    return n_evicted, size
+
+
+def _build_future_exog(result, spec, future_df, n_future):
+    """Build the future exogenous matrix for a fitted model.
+
+    For M' models with log_icms_lag12:
+    Steps 1-12: lag12 = known historical log(ICMS) from 12 months ago.
+    Steps 13+: lag12 = model's own forecast from 12 steps prior (recursive).
+    """
+    if "log_icms_lag12" not in spec["exog_cols"]:
+        return future_df[spec["exog_cols"]].astype(float)
+
+    # First 12 steps: historical values (already in future_df from prepare_base)
+    # Beyond 12: filled recursively from the model's own point forecasts
+    future_exog = future_df[spec["exog_cols"]].iloc[:n_future].astype(float)
+    if future_exog["log_icms_lag12"].notna().all():
+        return future_exog
+    with _perf_span("lag12_forecast"):
+        try:
+            future_exog, _ = _forecast_lag12_recursive(result, future_exog)
+        except ValueError:
+            future_exog = _forecast_lag12_stepwise(result, future_exog)
+    return future_exog
+
+
+def _forecast_lag12_recursive(result, future_exog):
+    """Point forecast with lag-12 feedback in one state-space pass.
+
+    Runs the forecast-mean recursion
+
+        y_t = x_t' beta + Z a_t,    a_{t+1} = c + T a_t
+
+    from the end-of-sample predicted state, writing each step's forecast
+    into the log_icms_lag12 regressor 12 steps later wherever it is unknown.
+    Linear in the horizon and equal to get_forecast() on the filled exog.
+
+    Returns (filled future exog, log-scale point forecast).
+    """
+    Z, T, _, _, _, c, beta = _state_space_matrices(result)
+    X = future_exog.to_numpy(dtype=float, copy=True)
+    lag_col = list(future_exog.columns).index("log_icms_lag12")
+    state = np.asarray(result.predicted_state[:, -1], dtype=float)
+
+    mean = np.empty(len(X))
+    for t in range(len(X)):
+        if np.isnan(X[t, lag_col]) and t >= 12:
+            X[t, lag_col] = mean[t - 12]
+        mean[t] = X[t] @ beta + state @ Z[0]
+        state = c + T @ state
+    return pd.DataFrame(X, index=future_exog.index, columns=future_exog.columns), mean
+
+
+def _forecast_lag12_stepwise(result, future_exog):
+    """Fallback for lag-12 feedback: one get_forecast() per unknown step (quadratic)."""
+    future_exog = future_exog.copy()
+    lag12_vals = future_exog["log_icms_lag12"].values.copy()
+    for step_idx in range(len(lag12_vals)):
+        if np.isnan(lag12_vals[step_idx]):
+            # lag12 for this step = forecast from step (step_idx - 12)
+            src_idx = step_idx - 12
+            if src_idx >= 0:
+                future_exog_partial = future_exog.iloc[:step_idx].copy()
+                future_exog_partial["log_icms_lag12"] = lag12_vals[:step_idx]
+                with _perf_span("forecast"):
+                    partial_fc = result.get_forecast(steps=step_idx, exog=future_exog_partial)
+                lag12_vals[step_idx] = float(partial_fc.predicted_mean.iloc[src_idx])
+    future_exog["log_icms_lag12"] = lag12_vals
+    return future_exog
+
+
+def _state_space_matrices(fitted_result):
+    """Time-invariant system matrices of a fitted univariate SARIMAX.
+
+    Returns (Z, T, R, Q, H, c, beta), where beta are the exog coefficients
+    (empty without exog). Raises ValueError for structures outside that
+    form.
+    """
+    model = fitted_result.model
+    fr = fitted_result.filter_results
+    if model.k_endog != 1 or not getattr(model, "mle_regression", True):
+        raise ValueError("only univariate SARIMAX with MLE regression is supported")
+    for name in ("design", "transition", "selection", "state_cov", "obs_cov", "state_intercept"):
+        if getattr(fr, name).shape[-1] != 1:
+            raise ValueError(f"time-varying '{name}' not supported")
+
+    beta = np.zeros(0)
+    if model.k_exog:
+        beta = np.asarray(fitted_result.params[model.exog_names], dtype=float)
+    return (fr.design[:, :, 0], fr.transition[:, :, 0], fr.selection[:, :, 0],
+            fr.state_cov[:, :, 0], fr.obs_cov[:, :, 0], fr.state_intercept[:, 0], beta)
+
+
+def _standard_normals(rng, n, dim, sampler):
+    """(n, dim) standard normal draws from the requested sampler.
+
+    antithetic: the second half of the rows mirrors the first (z, -z).
+    sobol/halton: one scrambled low-discrepancy point per row (each path
+    is a point in dim dimensions), mapped through the normal inverse CDF.
+    """
+    if sampler == "antithetic":
+        half = rng.standard_normal(((n + 1) // 2, dim))
+        return np.concatenate([half, -half])[:n]
+    if sampler in ("sobol", "halton"):
+        engine_cls = qmc.Sobol if sampler == "sobol" else qmc.Halton
+        u = engine_cls(d=dim, scramble=True, seed=rng).random(n)
+        return norm.ppf(np.clip(u, 1e-12, 1 - 1e-12))
+    return rng.standard_normal((n, dim))
+
+
+def _standardized_residuals(fitted_result):
+    """Standardized one-step errors after the diffuse burn-in, rescaled to mean 0, sd 1."""
+    resid = np.asarray(fitted_result.filter_results.standardized_forecasts_error[0], dtype=float)
+    resid = resid[fitted_result.loglikelihood_burn:]
+    resid = resid[np.isfinite(resid)]
+    if len(resid) < 2:
+        raise ValueError("not enough residuals to bootstrap")
+    return (resid - resid.mean()) / resid.std()
+
+
+def _bootstrap_innovations(rng, resid, n, n_steps, block_length=None):
+    """(n, n_steps) innovations resampled from resid.
+
+    iid when block_length is None/1; otherwise each path concatenates random
+    blocks of block_length consecutive residuals (moving-block bootstrap),
+    which keeps short-range dependence and clustered large shocks.
+    """
+    if not block_length or block_length <= 1:
+        return resid[rng.integers(0, len(resid), size=(n, n_steps))]
+    block_length = min(int(block_length), len(resid))
+    n_blocks = -(-n_steps // block_length)
+    starts = rng.integers(0, len(resid) - block_length + 1, size=(n, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block_length)).reshape(n, -1)[:, :n_steps]
+    return resid[idx]
+
+
+def _psd_sqrt(cov):
+    """Symmetric square root of a positive semi-definite matrix.
+
+    Used instead of a Cholesky factor because the predicted state covariance
+    of differenced / seasonal SARIMAX states is frequently singular.
+    """
+    eigval, eigvec = np.linalg.eigh((cov + cov.T) / 2)
+    return eigvec * np.sqrt(np.clip(eigval, 0, None))
+
+
+def _simulate_paths_batch(fitted_result, n_steps, exog_future, n_simulations, rng,
+                          lag12_feedback=None, sampler="normal", block_length=MC_BLOCK_LENGTH):
+    """Simulate all Monte Carlo paths of a fitted SARIMAX in one batched pass.
+
+    Equivalent to calling ``fitted_result.simulate(anchor='end')`` once per
+    path: the initial state is drawn from the one-step-ahead predicted state
+    distribution at the end of the sample and the recursion
+
+        y_t     = d_t + Z a_t + eps_t,     eps_t ~ N(0, H)
+        a_{t+1} = c + T a_t + R eta_t,     eta_t ~ N(0, Q)
+
+    is propagated for every path at once. All state shocks are drawn up front
+    as a single ``(n_simulations, n_steps, k_posdef)`` tensor, so the only
+    Python loop is over the forecast horizon (not over paths).
+
+    lag12_feedback (boolean mask over steps) marks steps whose
+    log_icms_lag12 regressor is model-generated: there each path's intercept
+    uses that path's own simulated value 12 steps earlier instead of the
+    point forecast held in exog_future, so the feedback is path-consistent.
+
+    sampler picks the shock generator (see MC_SAMPLERS). For antithetic and
+    the QMC samplers all of a path's innovations (initial state, state and
+    observation shocks) are one row of _standard_normals. The bootstrap
+    samplers replace the Gaussian state innovations with resampled
+    standardized residuals (block_length months per block for
+    "block_bootstrap"); the initial-state draw stays Gaussian.
+
+    Returns log-scale paths with shape ``(n_simulations, n_steps)``.
+    """
+    Z, T, R, Q, H, c, beta = _state_space_matrices(fitted_result)
+    fr = fitted_result.filter_results
+
+    # Observation intercept over the simulation period: exog @ beta
+    d = np.zeros(n_steps)
+    if len(beta):
+        d = np.asarray(exog_future, dtype=float)[:n_steps] @ beta
+    elif fr.obs_intercept.shape[-1] == 1:
+        d = np.full(n_steps, fr.obs_intercept[0, 0])
+
+    k_posdef = Q.shape[0]
+    a0 = fitted_result.predicted_state[:, -1]
+    P0 = fitted_result.predicted_state_cov[:, :, -1]
+
+    k_states = len(a0)
+    has_obs_noise = bool(np.any(H))
+    if sampler in ("bootstrap", "block_bootstrap"):
+        if k_posdef != 1:
+            raise ValueError("residual bootstrap needs a single state innovation")
+        z_init = rng.standard_normal((n_simulations, k_states))
+        z_state = _bootstrap_innovations(
+            rng, _standardized_residuals(fitted_result), n_simulations, n_steps,
+            block_length if sampler == "block_bootstrap" else None,
+        )[:, :, None]
+        z_obs = rng.standard_normal((n_simulations, n_steps)) if has_obs_noise else None
+    elif sampler == "normal":
+        z_init = rng.standard_normal((n_simulations, k_states))
+        z_state = rng.standard_normal((n_simulations, n_steps, k_posdef))
+        z_obs = rng.standard_normal((n_simulations, n_steps)) if has_obs_noise else None
+    else:
+        dim = k_states + n_steps * k_posdef + (n_steps if has_obs_noise else 0)
+        z = _standard_normals(rng, n_simulations, dim, sampler)
+        z_init = z[:, :k_states]
+        z_state = z[:, k_states:k_states + n_steps * k_posdef].reshape(
+            n_simulations, n_steps, k_posdef)
+        z_obs = z[:, k_states + n_steps * k_posdef:] if has_obs_noise else None
+
+    states = a0 + z_init @ _psd_sqrt(P0).T
+    state_shocks = z_state @ _psd_sqrt(Q).T
+    state_shocks = state_shocks @ R.T  # (n_simulations, n_steps, k_states)
+    obs_shocks = np.zeros((n_simulations, n_steps))
+    if has_obs_noise:
+        obs_shocks = z_obs * np.sqrt(H[0, 0])
+
+    # Per-step lag-12 feedback: d_t(path) = d_t + beta_12 * (y_{t-12}(path) - x_t,lag12)
+    feedback = np.zeros(n_steps, dtype=bool)
+    if lag12_feedback is not None and "log_icms_lag12" in fitted_result.model.exog_names:
+        lag_pos = fitted_result.model.exog_names.index("log_icms_lag12")
+        beta_lag = beta[lag_pos]
+        lag_point = np.asarray(exog_future, dtype=float)[:n_steps, lag_pos]
+        feedback[:n_steps] = np.asarray(lag12_feedback, dtype=bool)[:n_steps]
+        feedback[:12] = False
+
+    sims_log = np.empty((n_simulations, n_steps))
+    for t in range(n_steps):
+        d_t = d[t]
+        if feedback[t]:
+            d_t = d_t + beta_lag * (sims_log[:, t - 12] - lag_point[t])
+        sims_log[:, t] = d_t + states @ Z[0] + obs_shocks[:, t]
+        states = c + states @ T.T + state_shocks[:, t, :]
+    return sims_log
+
+
+def _qmc_replicate_size(n_simulations, sampler, n_replicates=MC_QMC_REPLICATES):
+    """Paths per scrambled replicate when n_simulations is split into n_replicates.
+
+    Rounded up, and for Sobol up to the next power of 2 -- the point sets
+    lose their balance properties at other sizes.
+    """
+    size = max(1, -(-int(n_simulations) // n_replicates))
+    if sampler == "sobol":
+        size = 1 << (size - 1).bit_length()
+    return size
+
+
+def _run_monte_carlo(fitted_result, n_steps, exog_future, n_simulations=N_SIMULATIONS,
+                     seed=None, lag12_feedback=None, sampler="normal",
+                     block_length=MC_BLOCK_LENGTH, fallback=None):
     """Run Monte Carlo simulation for a fitted model.
 
-    Generates n_simulations forward paths using model.simulate(),
-    returns simulation paths in real (exp) scale.
+    Generates n_simulations forward paths with the batched state-space
+    engine (falls back to statsmodels' ``simulate(repetitions=...)`` for
+    model structures the batch engine does not cover), returns simulation
+    paths in real (exp) scale, shape [n_simulations, n_steps].
+    lag12_feedback feeds each path's own lag-12 values back and
+    sampler/block_length select the shock generator (batch engine only;
+    see _simulate_paths_batch).
+
+    The fallback draws plain pseudo-random paths without lag-12 feedback,
+    whatever was requested: it is counted in the perf span, and recorded
+    in the `fallback` dict (if given) as {"reason": <batch engine error>}.
 
     Returns None if simulation fails.
     """
-    try:
-        sims_log = np.zeros((n_simulations, n_steps))
-        for s in range(n_simulations):
-            sim = fitted_result.simulate(
-                nsimulations=n_steps, anchor='end', exog=exog_future
-            )
-            sims_log[s, :] = np.asarray(sim)
-        # Convert from log scale to real scale
-        sims_real = np.exp(sims_log)
-        return sims_real
-    except Exception:
+    rng = np.random.default_rng(seed)
+    with _perf_span("monte_carlo") as span:
+        span["paths"] = n_simulations
+        try:
+            try:
+                sims_log = _simulate_paths_batch(
+                    fitted_result, n_steps, exog_future, n_simulations, rng,
+                    lag12_feedback=lag12_feedback, sampler=sampler, block_length=block_length,
+                )
+            except ValueError as e:
+                span["fallback"] = True
+                if fallback is not None:
+                    fallback["reason"] = str(e)
+                # statsmodels renamed random_state -> rng in 0.15
+                rng_kw = "rng" if "rng" in inspect.signature(fitted_result.simulate).parameters else "random_state"
+                sim = fitted_result.simulate(
+                    nsimulations=n_steps, anchor='end', exog=exog_future,
+                    repetitions=n_simulations, **{rng_kw: rng},
+                )
+                sims_log = np.asarray(sim).reshape(n_steps, n_simulations).T
+            # Convert from log scale to real scale
+            sims_real = np.exp(sims_log)
+            return sims_real
+        except Exception:
+            return None
+
+
+
+def _batch_seed(seed, batch):
+    """Child seed for one MC batch (deterministic in seed and batch index)."""
+    ss = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return np.random.SeedSequence(ss.entropy, spawn_key=tuple(ss.spawn_key) + (batch,))
+
+
+def _run_monte_carlo_batches(fitted_result, n_steps, exog_future, seed, batch_size, batches,
+                             lag12_feedback=None, sampler="normal",
+                             block_length=MC_BLOCK_LENGTH, fallback=None):
+    """Simulate the given batch indices, each from its own child seed, stacked.
+
+    Batch b is the same paths whatever other batches are run, so a model
+    can be topped up later by simulating the next indices. None on failure.
+    """
+    out = []
+    for b in batches:
+        sims = _run_monte_carlo(fitted_result, n_steps, exog_future, batch_size,
+                                seed=_batch_seed(seed, b), lag12_feedback=lag12_feedback,
+                                sampler=sampler, block_length=block_length,
+                                fallback=fallback)
+        if sims is None:
+            return None
+        out.append(sims)
+    return np.concatenate(out)
+
+
+def _run_monte_carlo_adaptive(fitted_result, n_steps, exog_future, future_years, seed=None,
+                              batch_size=MC_BATCH_SIZE, max_simulations=MC_MAX_SIMULATIONS,
+                              tolerance=MC_TOLERANCE, lag12_feedback=None, sampler="normal",
+                              block_length=MC_BLOCK_LENGTH, fallback=None):
+    """Adaptive Monte Carlo: add batches until annual percentiles settle.
+
+    After each batch the annual-total p5/p50/p95 of all paths so far are
+    compared with the previous batch's; simulation stops once the largest
+    relative change is below tolerance, or at max_simulations.
+
+    Returns (sims, n_converged): real-scale paths and the path count at
+    which the stop criterion was met (None if the budget ran out first).
+    """
+    max_batches = max(2, max_simulations // batch_size)
+    sims, prev = None, None
+    for b in range(max_batches):
+        batch = _run_monte_carlo_batches(fitted_result, n_steps, exog_future, seed, batch_size,
+                                         [b], lag12_feedback=lag12_feedback, sampler=sampler,
+                                         block_length=block_length, fallback=fallback)
+        if batch is None:
+            return sims, None
+        sims = batch if sims is None else np.concatenate([sims, batch])
+        annual = _aggregate_mc_paths(sims[None], future_years)["annual"][0]
+        pct = np.percentile(annual, MC_CONVERGENCE_PERCENTILES, axis=0)
+        if prev is not None and np.max(np.abs(pct - prev) / np.abs(prev)) < tolerance:
+            return sims, len(sims)
+        prev = pct
+    return sims, None
+
+
+def _mc_standard_errors(sims, future_years, batch_size=MC_BATCH_SIZE):
+    """Batch-means Monte Carlo standard error of annual p5/p50/p95 (R$ bi).
+
+    Splits the paths into consecutive batches, takes each batch's annual
+    percentiles and reports std / sqrt(n_batches). None with < 2 batches.
+    """
+    n_batches = len(sims) // batch_size
+    if n_batches < 2:
         return None
+    agg = _aggregate_mc_paths(sims[None, :n_batches * batch_size], future_years)
+    annual = agg["annual"][0].reshape(n_batches, batch_size, -1)
+    pct = np.percentile(annual, MC_CONVERGENCE_PERCENTILES, axis=1)   # (P, batches, years)
+    se = pct.std(axis=1, ddof=1) / np.sqrt(n_batches)
+    return {
+        str(yr): {f"p{p}": round(float(se[k, j]) / 1e9, 3)
+                  for k, p in enumerate(MC_CONVERGENCE_PERCENTILES)}
+        for j, yr in enumerate(agg["years"])
+    }
+
+
+def _aggregate_mc_paths(paths, future_years, year_offsets=None, monthly=False):
+    """Annual sums and percentiles of Monte Carlo paths in one vectorized pass.
+
+    paths has shape (models, sims, months). A (months, years) year-indicator
+    matrix turns every path into annual sums with one matmul, and each
+    percentile set is a single np.percentile call over the sims axis.
+    year_offsets ({year: value}) is added to the annual sums before the
+    percentiles/means (realized ICMS of the current year).
+
+    Returns a dict with "years", "annual" (raw sums, (models, sims, years)),
+    "annual_percentiles" ((len(MC_PERCENTILES), models, years)),
+    "annual_mean" ((models, years)) and, with monthly=True,
+    "monthly_percentiles" ((len(MC_PERCENTILES), models, months)).
+    """
+    future_years = np.asarray(future_years)
+    years = np.unique(future_years)
+    indicator = (future_years[:, None] == years[None, :]).astype(paths.dtype)
+    annual = paths @ indicator
+    offsets = np.array([(year_offsets or {}).get(int(yr), 0.0) for yr in years])
+    annual_with_offsets = annual + offsets
+    agg = {
+        "years": [int(yr) for yr in years],
+        "annual": annual,
+        "annual_percentiles": np.percentile(annual_with_offsets, MC_PERCENTILES, axis=1),
+        "annual_mean": annual_with_offsets.mean(axis=1),
+    }
+    if monthly:
+        agg["monthly_percentiles"] = np.percentile(paths, MC_PERCENTILES, axis=1)
+    return agg
+
+
+def _mc_annual_summary(agg, model_idx):
+    """{year: {low_95, ..., high_95, mean}} in R$ bi for one model of an aggregate."""
+    out = {}
+    for j, yr in enumerate(agg["years"]):
+        entry = {key: round(float(agg["annual_percentiles"][k, model_idx, j]) / 1e9, 2)
+                 for k, key in enumerate(MC_ANNUAL_KEYS.values())}
+        entry["mean"] = round(float(agg["annual_mean"][model_idx, j]) / 1e9, 2)
+        out[str(yr)] = entry
+    return out
+
+
+def _write_mc_paths(od, names, mc_simulations, future_dates):
+    """Save MC paths as a float32 .npy sidecar; return the JSON reference to it.
+
+    Readers memory-map the array (np.load(..., mmap_mode="r")) instead of
+    parsing per-path lists out of run_sarimax_models.json.
+    """
+    paths = np.stack([mc_simulations[n] for n in names]).astype(np.float32)
+    np.save(od / MC_PATHS_FILE, paths)
+    return {
+        "file": MC_PATHS_FILE,
+        "format": "npy",
+        "dtype": "float32",
+        "shape": list(paths.shape),
+        "axes": ["model", "simulation", "month"],
+        "models": list(names),
+        "months": list(future_dates),
+        "units": "BRL",
+    }
+
+
+def _write_fitted_models(od, full_sample_fits, dates):
+    """Save the full-sample fits as a compact npz; return the JSON reference to it.
+
+    Model i is stored as m{i}_params, m{i}_cov_params, m{i}_resid,
+    m{i}_smoothed_state (k_states, nobs) and m{i}_dates (datetime64[M] of
+    the fitted sample), so downstream steps read residuals and states
+    instead of refitting. dates maps the training index to dates.
+    """
+    arrays, models = {}, {}
+    for i, (name, result) in enumerate(full_sample_fits.items()):
+        prefix = f"m{i}"
+        params = np.asarray(result.params, dtype=float)
+        try:
+            cov_params = np.asarray(result.cov_params(), dtype=float)
+        except Exception:
+            cov_params = np.full((len(params), len(params)), np.nan)
+        arrays[f"{prefix}_params"] = params
+        arrays[f"{prefix}_cov_params"] = cov_params
+        arrays[f"{prefix}_resid"] = np.asarray(result.resid, dtype=float)
+        arrays[f"{prefix}_smoothed_state"] = np.asarray(result.smoothed_state, dtype=float)
+        arrays[f"{prefix}_dates"] = dates.loc[result.resid.index].values.astype("datetime64[M]")
+        models[name] = {
+            "prefix": prefix,
+            "param_names": list(result.param_names),
+            "nobs": int(result.nobs),
+            "loglikelihood_burn": int(result.loglikelihood_burn),
+        }
+    np.savez_compressed(od / FITTED_MODELS_FILE, **arrays)
+    return {
+        "file": FITTED_MODELS_FILE,
+        "format": "npz",
+        "arrays": ["params", "cov_params", "resid", "smoothed_state", "dates"],
+        "models": models,
+    }
+
+
+SCENARIO_CHUNK = 32  # scenarios per batched ensemble-path pass
+
+
+def _scenario_grid(grid, baseline):
+    """Cartesian (pib_growth_pct, igpm_growth_pct) scenarios from a sweep spec.
+
+    grid is {"pib_growth_pct": [...], "igpm_growth_pct": [...]}; an omitted
+    axis stays at the baseline (prepare_base scenario_params).
+    """
+    pibs = grid.get("pib_growth_pct") or [baseline["pib_growth_pct"]]
+    igpms = grid.get("igpm_growth_pct") or [baseline["igpm_growth_pct"]]
+    return [(float(p), float(g)) for p in pibs for g in igpms]
+
+
+def _scenario_macro(frame, projection, pib_growth, igpm_growth):
+    """IBC-BR / IGP-DI and their lags 1-4 under each growth scenario.
+
+    Re-runs prepare_base's projections vectorized over scenarios: months
+    after the last observed value follow the scenario's calibrated path,
+    observed months are kept. frame holds train + future rows in date
+    order; pib_growth / igpm_growth are (S,) annual rates as fractions.
+    Returns {column: (S, len(frame))}.
+    """
+    dates = frame["data"]
+    g_pib = np.asarray(pib_growth, dtype=float)[:, None]
+    g_igp = np.asarray(igpm_growth, dtype=float)[:, None]
+    out = {}
+
+    ibc = projection["ibc_br"]
+    values = np.tile(frame["ibc_br"].to_numpy(dtype=float), (len(g_pib), 1))
+    mask = (dates > pd.Timestamp(ibc["last_observed"])).to_numpy()
+    years_ahead = (dates.dt.year - ibc["base_year"]).to_numpy()[mask]
+    seasonal = np.asarray(ibc["seasonal_factors"])[dates.dt.month.to_numpy()[mask] - 1]
+    values[:, mask] = ibc["base_annual_mean"] * (1 + g_pib) ** years_ahead * seasonal
+    out["ibc_br"] = values
+
+    igp = projection["igp_di"]
+    last_date, target_dec = pd.Timestamp(igp["last_observed"]), pd.Timestamp(igp["target_dec"])
+    dec_prev = igp["dec_prev"] if igp["dec_prev"] is not None else igp["last_value"] / (1 + g_igp)
+    dec_target = dec_prev * (1 + g_igp) ** igp["target_years"]
+    months_to_dec = max(1, (target_dec.year - last_date.year) * 12
+                        + (target_dec.month - last_date.month))
+    monthly = (dec_target / igp["last_value"]) ** (1 / months_to_dec) - 1
+    values = np.tile(frame["igp_di"].to_numpy(dtype=float), (len(g_igp), 1))
+    mask = (dates > last_date).to_numpy()
+    months = ((dates.dt.year - last_date.year) * 12 + (dates.dt.month - last_date.month)).to_numpy()
+    values[:, mask] = igp["last_value"] * (1 + monthly) ** months[mask]
+    out["igp_di"] = values
+
+    for col in ("ibc_br", "igp_di"):
+        for lag in range(1, 5):
+            shifted = np.full_like(out[col], np.nan)
+            shifted[:, lag:] = out[col][:, :-lag]
+            out[f"{col}_lag{lag}"] = shifted
+    return out
+
+
+def _scenario_log_shifts(fitted_result, X_future, scenario_cols, lag12_feedback=None):
+    """(S, n_steps) shift of a fitted model's log forecast under each scenario.
+
+    Exog only enters the observation intercept, so a scenario moves the
+    point forecast and every MC path of the model by the same amount:
+    delta x_t' beta, plus beta_lag12 times the shift 12 steps earlier where
+    log_icms_lag12 is model-generated (exactly what the path-consistent
+    feedback in _simulate_paths_batch does). scenario_cols maps exog
+    columns to their (S, n_steps) scenario values.
+    """
+    *_, beta = _state_space_matrices(fitted_result)
+    exog_names = list(fitted_result.model.exog_names or [])
+    X0 = np.asarray(X_future, dtype=float)
+    n_scenarios = len(next(iter(scenario_cols.values())))
+    shift = np.zeros((n_scenarios, X0.shape[0]))
+    for j, col in enumerate(exog_names):
+        if col in scenario_cols:
+            shift += (scenario_cols[col] - X0[:, j]) * beta[j]
+    if lag12_feedback is not None and "log_icms_lag12" in exog_names:
+        beta_lag = beta[exog_names.index("log_icms_lag12")]
+        feedback = np.asarray(lag12_feedback, dtype=bool)
+        for t in range(12, X0.shape[0]):
+            if feedback[t]:
+                shift[:, t] += beta_lag * shift[:, t - 12]
+    return shift
+
+
+def _scenario_factors(full_sample_fits, forecasts_output, mc_inputs, future_df, scenario_cols):
+    """{model: (S, n_steps) multiplicative factor} on the real-scale forecast per scenario.
+
+    Models whose structure _state_space_matrices does not cover are left out.
+    """
+    n_future = len(future_df)
+    factors = {}
+    for name, fitted in full_sample_fits.items():
+        if name not in forecasts_output:
+            continue
+        spec = ALL_MODEL_SPECS[name]
+        if name in mc_inputs:
+            X_future, lag12_feedback = mc_inputs[name]
+        else:
+            X_future = _build_future_exog(fitted, spec, future_df, n_future)
+            lag12_feedback = (future_df["log_icms_lag12"].isna().values
+                              if "log_icms_lag12" in spec["exog_cols"] else None)
+        try:
+            factors[name] = np.exp(_scenario_log_shifts(fitted, X_future, scenario_cols,
+                                                        lag12_feedback))
+        except ValueError:
+            continue
+    return factors
+
+
+def _run_scenario_sweep(scenarios, projection, train_df, future_df, full_sample_fits,
+                        forecasts_output, mc_simulations, mc_inputs, components, weights,
+                        year_offsets):
+    """Forecasts and MC annual bands for every scenario, without refitting.
+
+    Each model's log shift (_scenario_log_shifts) rescales its point
+    forecast and its existing MC paths, so the sweep reuses one set of
+    paths; the ensemble (components, weights as in the headline CIs) is
+    aggregated in chunks of SCENARIO_CHUNK scenarios.
+
+    Returns the scenario_sweep output block (R$ bi; the current year
+    includes realized ICMS).
+    """
+    frame = pd.concat([train_df, future_df], ignore_index=True)
+    pib = np.array([p for p, _ in scenarios]) / 100
+    igpm = np.array([g for _, g in scenarios]) / 100
+    n_future = len(future_df)
+    scenario_cols = {col: values[:, -n_future:] for col, values
+                     in _scenario_macro(frame, projection, pib, igpm).items()}
+    future_years = future_df["data"].dt.year.values
+    years = np.unique(future_years)
+    indicator = (future_years[:, None] == years[None, :]).astype(float)
+    offsets = np.array([year_offsets.get(int(yr), 0.0) for yr in years])
+
+    factors = _scenario_factors(full_sample_fits, forecasts_output, mc_inputs, future_df,
+                                scenario_cols)
+    point_bi = {}
+    for name, factor in factors.items():
+        point = np.array([f["forecast"] for f in forecasts_output[name]])
+        point_bi[name] = np.round((factor * point) @ indicator / 1e9
+                                  + offsets / 1e9, 2).tolist()
+
+    sweep = {
+        "scenarios": [{"pib_growth_pct": p, "igpm_growth_pct": g} for p, g in scenarios],
+        "years": [int(yr) for yr in years],
+        "percentiles": MC_PERCENTILES,
+        "models": {name: {"annual_point_bi": v} for name, v in point_bi.items()},
+        "ensemble": None,
+    }
+    used = [n for n in components if n in factors and n in mc_simulations]
+    if not used:
+        return sweep
+    w = np.array([weights.get(n, np.nan) for n in used], dtype=float)
+    w = w / w.sum() if np.all(np.isfinite(w)) else np.full(len(used), 1 / len(used))
+
+    pct_chunks, mean_chunks = [], []
+    for start in range(0, len(scenarios), SCENARIO_CHUNK):
+        sl = slice(start, start + SCENARIO_CHUNK)
+        paths = sum(wi * mc_simulations[n][None] * factors[n][sl, None, :]
+                    for wi, n in zip(w, used))  # (chunk, sims, months)
+        agg = _aggregate_mc_paths(paths, future_years, year_offsets=year_offsets)
+        pct_chunks.append(agg["annual_percentiles"])
+        mean_chunks.append(agg["annual_mean"])
+    pct = np.concatenate(pct_chunks, axis=1).transpose(1, 2, 0)  # (scenario, year, pct)
+    sweep["ensemble"] = {
+        "models": used,
+        "weights": {n: round(float(wi), 4) for n, wi in zip(used, w)},
+        "annual_percentiles_bi": np.round(pct / 1e9, 2).tolist(),
+        "annual_mean_bi": np.round(np.concatenate(mean_chunks) / 1e9, 2).tolist(),
+    }
+    return sweep
+
+
+SENSITIVITY_GRID = [-1.0, -0.5, 0.5, 1.0]  # driver perturbations (pp of growth / business days)
+# Drivers perturbed by the sensitivity table and the exog series they move
+SENSITIVITY_DRIVERS = {
+    "pib_growth_pct": "ibc_br",
+    "igpm_growth_pct": "igp_di",
+    "dias_uteis": "dias_uteis",
+}
 
 
+def _sensitivity_scenarios(frame, projection, baseline, grid, n_future):
+    """One scenario per (driver, step) for the sensitivity table.
+
+    Growth drivers re-run the macro projection with baseline + step pp
+    (_scenario_macro); dias_uteis adds step business days to every
+    forecast month. Every other exog column stays at its baseline, and lags
+    move with their series. Returns (labels, {column: (S, n_future)}).
+    """
+    grid = np.asarray(grid, dtype=float)
+    labels = [(driver, float(step)) for driver in SENSITIVITY_DRIVERS for step in grid]
+    pib = np.full(len(labels), baseline["pib_growth_pct"], dtype=float)
+    igpm = np.full(len(labels), baseline["igpm_growth_pct"], dtype=float)
+    days = np.zeros(len(labels))
+    for i, (driver, step) in enumerate(labels):
+        {"pib_growth_pct": pib, "igpm_growth_pct": igpm, "dias_uteis": days}[driver][i] += step
+    cols = _scenario_macro(frame, projection, pib / 100, igpm / 100)
+
+    shocked = np.zeros((len(labels), len(frame)))
+    shocked[:, -n_future:] = days[:, None]
+    dias = frame["dias_uteis"].to_numpy(dtype=float) + shocked
+    cols["dias_uteis"] = dias
+    for lag in range(1, 5):
+        shifted = np.full_like(dias, np.nan)
+        shifted[:, lag:] = dias[:, :-lag]
+        cols[f"dias_uteis_lag{lag}"] = shifted
+    return labels, {col: values[:, -n_future:] for col, values in cols.items()}
+
+
+def _run_sensitivity(grid, projection, baseline, train_df, future_df, full_sample_fits,
+                     forecasts_output, mc_inputs, ensemble_name, ensemble_weights,
+                     year_offsets):
+    """Annual-total sensitivity of every model (and the best ensemble) to each driver.
+
+    Uses the scenario shifts of the fitted models (_scenario_log_shifts),
+    so no refit and no simulation. Per driver, model and year: the change
+    in the annual total (R$ bi) at each grid step and the least-squares
+    slope through the origin, in R$ bi and in % of the baseline total per
+    unit of the driver (1 pp of growth / 1 business day per month).
+    """
+    frame = pd.concat([train_df, future_df], ignore_index=True)
+    labels, scenario_cols = _sensitivity_scenarios(frame, projection, baseline, grid,
+                                                   len(future_df))
+    factors = _scenario_factors(full_sample_fits, forecasts_output, mc_inputs, future_df,
+                                scenario_cols)
+    future_years = future_df["data"].dt.year.values
+    years = np.unique(future_years)
+    indicator = (future_years[:, None] == years[None, :]).astype(float)
+    offsets = np.array([year_offsets.get(int(yr), 0.0) for yr in years])
+
+    points = {name: np.array([f["forecast"] for f in forecasts_output[name]])
+              for name in factors}
+    weights = {n: w for n, w in (ensemble_weights or {}).items() if n in factors}
+    if ensemble_name and weights:
+        total = sum(weights.values())
+        points[ensemble_name] = sum(w / total * points[n] for n, w in weights.items())
+        factors[ensemble_name] = sum(w / total * points[n] * factors[n]
+                                     for n, w in weights.items()) / points[ensemble_name]
+
+    steps = np.asarray(grid, dtype=float)
+    table = {driver: {} for driver in SENSITIVITY_DRIVERS}
+    for name, factor in factors.items():
+        base_annual = points[name] @ indicator + offsets
+        delta = ((factor - 1) * points[name]) @ indicator  # (S, years)
+        for driver in SENSITIVITY_DRIVERS:
+            rows = [i for i, (d, _) in enumerate(labels) if d == driver]
+            d = delta[rows]
+            slope = steps @ d / (steps @ steps)
+            table[driver][name] = {
+                str(yr): {
+                    "delta_bi": [round(float(v) / 1e9, 3) for v in d[:, j]],
+                    "bi_per_unit": round(float(slope[j]) / 1e9, 3),
+                    "pct_per_unit": round(float(slope[j] / base_annual[j]) * 100, 3),
+                }
+                for j, yr in enumerate(years)
+            }
+    return {
+        "grid": [float(s) for s in steps],
+        "units": {"pib_growth_pct": "pp", "igpm_growth_pct": "pp",
+                  "dias_uteis": "business days per month"},
+        "baseline": baseline,
+        "ensemble": ensemble_name if ensemble_name and weights else None,
+        "drivers": table,
+    }
+
 
 def _compute_inverse_mse_weights(component_preds, y_test_real):
     """Compute inverse-MSE weights for forecast combination.
@@ -250,37 +1439,311 @@ def _determine_oos_horizon(target_horizon, first_valid_cutoff, last_obs):
     return max(1, target_horizon)  # fallback
 
 
-def _run_all_expanding_windows(train_df, y_full, model_specs, full_sample_fits,
-                               oos_horizon):
-    """Run expanding-window OOS for ALL models with dummy pre-correction.
+def _select_cutoffs(all_cutoffs, max_windows):
+    """Space cutoffs evenly when there are more than max_windows (0/None = all)."""
+    if max_windows and len(all_cutoffs) > max_windows:
+        step = max(1, len(all_cutoffs) // max_windows)
+        return all_cutoffs[::step]
+    return all_cutoffs
+
+
+def _oos_forecast_window(y_train, X_train, X_test, order, seasonal_order, params=None,
+                         start_params=None, maxiter=None):
+    """Fit one expanding window and forecast its test span.
+
+    Returns {"pred": real-scale forecast, "params": fitted parameters} plus
+    the optimizer's iteration count, convergence flag and fit wall time. With
+    params given (a persisted window whose test span changed), the window is
+    re-filtered at those parameters instead of refit.
+    """
+    t0 = time.perf_counter()
+    fitted = _fit_model(y_train, X_train, order, seasonal_order, params=params,
+                        start_params=start_params, maxiter=maxiter)
+    fit_seconds = time.perf_counter() - t0
+    retvals = getattr(fitted, "mle_retvals", None) or {}
+    with _perf_span("forecast"):
+        pred = fitted.get_forecast(steps=len(X_test), exog=X_test)
+    return {"pred": np.exp(pred.predicted_mean).values,
+            "params": np.asarray(fitted.params, dtype=float),
+            "iterations": retvals.get("iterations"),
+            "converged": retvals.get("converged"),
+            "fit_seconds": fit_seconds if params is None else None}
+
+
+def _full_sample_oos_params(full_result):
+    """Full-sample parameters mapped onto the OOS model (dummies are not in OOS models)."""
+    dummies = [c for c in DUMMY_COLS if c in full_result.params.index]
+    return full_result.params.drop(labels=dummies).values
+
+
+def _default_cache_dir(od):
+    """workspace/cache for the project owning output_dir (run dirs live in workspace/)."""
+    root = od.resolve()
+    for _ in range(5):
+        if (root / "workspace").is_dir():
+            return root / "workspace" / "cache"
+        root = root.parent
+    return Path(__file__).resolve().parent.parent / "workspace" / "cache"
+
+
+def _oos_window_key(spec, y_train, X_train, dummy_coeffs, fit_options=None):
+    """Content hash of the inputs of an OOS window fit.
+
+    Covers the spec, the uncorrected log(ICMS) and exog (dummies included)
+    up to the cutoff, the full-sample dummy coefficients (which, with the
+    dummies, fix the corrected series the window is fitted on), the
+    optimizer options (warm start, maxiter) and the statsmodels version.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps({
+        "version": OOS_STORE_VERSION,
+        "statsmodels": statsmodels.__version__,
+        "order": list(spec["order"]),
+        "seasonal_order": list(spec["seasonal_order"]),
+        "exog_cols": list(spec["exog_cols"]),
+        "dummy_coeffs": dummy_coeffs,
+        "fit_options": fit_options or {},
+    }, sort_keys=True).encode("utf-8"))
+    h.update(np.ascontiguousarray(y_train, dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(X_train, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+def _read_oos_window(store_dir, key):
+    """Persisted OOS window for key, or None if absent/unreadable."""
+    try:
+        return json.loads((store_dir / key[:2] / f"{key}.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _write_oos_window(store_dir, key, entry):
+    """Persist one OOS window (atomic replace; failures only cost a refit next run)."""
+    path = store_dir / key[:2] / f"{key}.json"
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(entry, cls=_NumpyEncoder), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+# Worker-side views of the shared-memory OOS arrays (set by _oos_worker_init)
+_OOS_SHARED = {}
+
+
+def _oos_worker_init(x_name, x_shape, y_name, y_shape):
+    """Pool initializer: map train_df exog and per-model y_adj from shared memory."""
+    for key, name, shape in (("X", x_name, x_shape), ("Y", y_name, y_shape)):
+        shm = shared_memory.SharedMemory(name=name)
+        _OOS_SHARED[key + "_shm"] = shm
+        _OOS_SHARED[key] = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+
+
+def _oos_iter_chain(X, Y, model_idx, col_idx, col_names, order, seasonal_order, windows,
+                    maxiter=None):
+    """Run one model's OOS windows in order, reading data from the X/Y arrays.
+
+    windows holds (train_rows, test_rows, params, start_params) tuples; a
+    start_params of "previous" warm-starts from the previous window's fit.
+    Yields each window's result (None if its fit failed).
+    """
+    col_idx = list(col_idx)
+    prev_params = None
+    for train_rows, test_rows, params, start_params in windows:
+        if isinstance(start_params, str):
+            start_params = prev_params
+        try:
+            train_index = pd.RangeIndex(train_rows.start, train_rows.stop)
+            test_index = pd.RangeIndex(test_rows.start, test_rows.stop)
+            y_train = pd.Series(Y[model_idx, train_rows], index=train_index)
+            X_train = pd.DataFrame(X[train_rows][:, col_idx], index=train_index,
+                                   columns=col_names)
+            X_test = pd.DataFrame(X[test_rows][:, col_idx], index=test_index,
+                                  columns=col_names)
+            window = _oos_forecast_window(y_train, X_train, X_test, order, seasonal_order,
+                                          params=params, start_params=start_params,
+                                          maxiter=maxiter)
+            prev_params = window["params"]
+        except Exception:
+            window = None
+        yield window
+
+
+def _oos_run_chain(X, Y, model_idx, col_idx, col_names, order, seasonal_order, windows,
+                   maxiter=None):
+    """_oos_iter_chain's window results as a list."""
+    return list(_oos_iter_chain(X, Y, model_idx, col_idx, col_names, order, seasonal_order,
+                                windows, maxiter=maxiter))
+
+
+def _oos_shared_task(model_idx, col_idx, col_names, order, seasonal_order, windows,
+                     maxiter=None):
+    """One model's chain of OOS windows, reading its data from shared memory."""
+    return _oos_run_chain(_OOS_SHARED["X"], _OOS_SHARED["Y"], model_idx, col_idx,
+                          col_names, order, seasonal_order, windows, maxiter=maxiter)
+
+
+def _oos_shared_iter(model_idx, col_idx, col_names, order, seasonal_order, windows,
+                     maxiter=None):
+    """_oos_shared_task, yielding window by window (for _run_timed_tasks)."""
+    yield from _oos_iter_chain(_OOS_SHARED["X"], _OOS_SHARED["Y"], model_idx, col_idx,
+                               col_names, order, seasonal_order, windows, maxiter=maxiter)
+
+
+def _oos_resume_chain(args, n_done, last_window):
+    """_oos_shared_iter args for the rest of a chain after its first n_done windows.
+
+    A "previous" warm start on the first remaining window falls back to the
+    last window that did finish (or statsmodels' defaults).
+    """
+    windows = args[5][n_done:]
+    if not windows:
+        return None
+    train_rows, test_rows, params, start_params = windows[0]
+    if isinstance(start_params, str):
+        start_params = last_window["params"] if last_window is not None else None
+        windows = [(train_rows, test_rows, params, start_params), *windows[1:]]
+    return (*args[:5], windows, *args[6:])
+
+
+def _run_oos_grid(train_df, model_corrections, model_specs, chains, max_workers=1,
+                  maxiter=None, fit_timeout=None):
+    """Run OOS window chains, serially or on a process pool.
+
+    chains is a list of (model name, windows) -- one window per chain for
+    independent fits, or a model's whole cutoff sequence when each fit
+    warm-starts from the previous one. With max_workers > 1, train_df's exog
+    columns and every model's dummy-corrected y are copied once into shared
+    memory; each task only ships row slices.
+
+    fit_timeout (s) runs the chains on killable workers (_run_timed_tasks,
+    also with max_workers=1) and gives up on any window fit exceeding it.
+
+    Returns (chain results, {chain index: [timed-out window indices]}).
+    """
+    if not chains or not model_corrections:
+        return [], {}
+    names = list(model_corrections)
+    cols = sorted({c for corr in model_corrections.values() for c in corr["non_dummy_cols"]})
+    col_pos = {c: i for i, c in enumerate(cols)}
+    X_arr = train_df[cols].astype(float).to_numpy()
+    Y_arr = np.vstack([np.asarray(model_corrections[n]["y_adj"], dtype=float) for n in names])
+
+    args = []
+    for name, windows in chains:
+        non_dummy_cols = model_corrections[name]["non_dummy_cols"]
+        spec = model_specs[name]
+        args.append((names.index(name), tuple(col_pos[c] for c in non_dummy_cols),
+                     tuple(non_dummy_cols), spec["order"], spec["seasonal_order"],
+                     windows, maxiter))
+
+    if not fit_timeout and (max_workers <= 1 or len(args) <= 1):
+        return [_oos_run_chain(X_arr, Y_arr, *a[:-1], maxiter=maxiter) for a in args], {}
+
+    blocks = []
+    try:
+        for arr in (X_arr, Y_arr):
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, dtype=np.float64, buffer=shm.buf)[:] = arr
+            blocks.append(shm)
+        initargs = (blocks[0].name, X_arr.shape, blocks[1].name, Y_arr.shape)
+
+        if fit_timeout:
+            return _run_timed_tasks([(_oos_shared_iter, a, len(a[5])) for a in args],
+                                    max_workers, float(fit_timeout),
+                                    initializer=_oos_worker_init, initargs=initargs,
+                                    resume=_oos_resume_chain)
+
+        chunksize = max(1, len(args) // (max_workers * 4))
+        with _process_pool(max_workers, initializer=_oos_worker_init,
+                           initargs=initargs) as pool:
+            stage = _PERF["stage"]
+            return [_perf_result(out) for out in pool.map(
+                _perf_task, *zip(*[(_oos_shared_task, stage, *a) for a in args]),
+                chunksize=chunksize)], {}
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+
+def _build_oos_window_store(train_df, y_full, model_specs, full_sample_fits, horizons,
+                            max_workers=1, max_windows=MAX_OOS_WINDOWS, store_dir=None,
+                            warm_start="none", maxiter=None, mode="refit", fit_timeout=None):
+    """Fit every expanding OOS window once, forecasting up to the longest horizon.
 
     Dummy effects (estimated from full sample) are removed from both the
     training series and the test actuals. This allows starting windows much
     earlier than the last structural break, since the model only needs to
     predict the underlying dynamics (ARIMA + non-dummy exogenous).
 
-    Returns a dict keyed by model name with predictions, actuals, and MAPEs.
+    All requested horizons share one cutoff grid (spaced for the shortest
+    effective horizon), and each (model, cutoff) window is fitted once and
+    forecast as far ahead as the longest horizon allows. Every horizon's
+    windows are then sliced from this store by _slice_oos_windows instead
+    of being refit.
+
+    The (cutoff, model) grid is flattened into independent fits; with
+    max_workers > 1 they run on a process pool backed by shared memory.
+    warm_start seeds each fit's optimizer with the full-sample parameters
+    ("full_sample") or the previous cutoff's fit ("previous_cutoff", which
+    runs each model's cutoffs as one sequential chain); maxiter caps the
+    optimizer iterations.
+
+    mode="fixed_params" skips estimation altogether: every window is only
+    Kalman-filtered on the truncated series at the full-sample parameters
+    and forecast from there (fast screening; not persisted).
+    max_windows caps the number of evenly spaced cutoffs (0/None evaluates
+    every monthly cutoff).
+
+    With store_dir set, windows persist across runs keyed by _oos_window_key
+    on the data and dummy correction up to the cutoff, so a run only fits
+    windows whose corrected training series changed (for specs with
+    dummies, an appended month moves the full-sample coefficients and
+    refits them all). A stored window is reused as-is when its test exog is
+    unchanged; otherwise (the test span grew) it is re-filtered at its
+    stored parameters, which are the ones a fresh fit would find.
+
+    fit_timeout (s) caps each window fit (see _run_oos_grid); windows that
+    exceed it are left out and listed in store["skipped"] ({model: {cutoff:
+    "timeout"}}), so one pathological window cannot stall the run.
     """
     last_obs = train_df["data"].max()
     first_valid_date = train_df["data"].iloc[0] + pd.DateOffset(months=MIN_TRAIN_MONTHS)
 
-    # Dynamic horizon relaxation
-    effective_horizon = _determine_oos_horizon(oos_horizon, first_valid_date, last_obs)
+    # Dynamic horizon relaxation, per requested horizon
+    effective_horizons = {
+        h: _determine_oos_horizon(h, first_valid_date, last_obs) for h in horizons
+    }
+    store = {
+        "model_names": list(model_specs),
+        "first_valid_date": first_valid_date,
+        "last_obs": last_obs,
+        "effective_horizons": effective_horizons,
+        "windows": {name: {} for name in model_specs},
+        "n_cutoffs": 0,
+        "n_windows": 0,
+        "n_fits": 0,
+        "n_reused": 0,
+        "n_refiltered": 0,
+        "fit_stats": {},
+        "skipped": {},
+        "n_timed_out": 0,
+        "mode": mode,
+    }
+    h_min = min(effective_horizons.values())
+    h_max = max(effective_horizons.values())
 
-    latest_cutoff = last_obs - pd.DateOffset(months=effective_horizon)
+    latest_cutoff = last_obs - pd.DateOffset(months=h_min)
     if latest_cutoff <= first_valid_date:
-        return None, effective_horizon
+        return store
 
-    MAX_WINDOWS = 40  # cap to keep computation under ~3 min per horizon
     all_cutoffs = pd.date_range(start=first_valid_date, end=latest_cutoff, freq="MS")
     if len(all_cutoffs) == 0:
-        return None, effective_horizon
-    # Space cutoffs evenly if too many
-    if len(all_cutoffs) > MAX_WINDOWS:
-        step = max(1, len(all_cutoffs) // MAX_WINDOWS)
-        cutoff_dates = all_cutoffs[::step]
-    else:
-        cutoff_dates = all_cutoffs
+        return store
+    cutoff_dates = _select_cutoffs(all_cutoffs, max_windows)
 
     # Pre-correct dummy effects per model (using full-sample coefficients)
     model_corrections = {}
@@ -296,69 +1759,212 @@ def _run_all_expanding_windows(train_df, y_full, model_specs, full_sample_fits,
             "dummy_effects": dummy_effects,
             "dummy_coeffs": dummy_coeffs,
         }
+    # No spec got a full-sample fit (all failed or timed out): nothing to evaluate
+    if not model_corrections:
+        return store
 
-    # Initialize per-model storage
-    model_results = {
-        name: {"predictions": {}, "actuals": {}, "window_mapes": [], "cutoff_dates": []}
-        for name in model_specs
-    }
-
+    # Flatten the (cutoff, model) grid: (name, cutoff_str, train_rows, test_rows).
+    # train_df is sorted by date, so both spans are contiguous row slices.
+    windows = []
     for cutoff in cutoff_dates:
         train_mask = train_df["data"] <= cutoff
         test_start = cutoff + pd.DateOffset(months=1)
-        test_end = cutoff + pd.DateOffset(months=effective_horizon)
+        test_end = cutoff + pd.DateOffset(months=h_max)
         test_mask = (train_df["data"] >= test_start) & (train_df["data"] <= test_end)
-
-        train_subset = train_df[train_mask].copy()
-        test_subset = train_df[test_mask].copy()
-        n_test = len(test_subset)
-        if n_test < effective_horizon:
+        if int(test_mask.sum()) < h_min:
             continue
 
         cutoff_str = cutoff.strftime("%Y-%m-%d")
-
-        for name, spec in model_specs.items():
-            if name not in model_corrections:
-                continue
+        test_pos = np.flatnonzero(test_mask.values)
+        train_rows = slice(0, int(train_mask.sum()))
+        test_rows = slice(int(test_pos[0]), int(test_pos[-1]) + 1)
+        store["n_cutoffs"] += 1
+        for name in model_specs:
+            if name in model_corrections:
+                windows.append((name, cutoff_str, train_rows, test_rows))
+    store["n_windows"] = len(windows)
+
+    # Resolve persisted windows: reuse the forecast when the test exog matches
+    # (prefix of a longer stored span), else re-filter at the stored params.
+    if mode == "fixed_params":
+        store_dir = None
+    results = [None] * len(windows)
+    keys = [None] * len(windows)
+    tasks, task_pos = [], []
+    for i, (name, cutoff_str, train_rows, test_rows) in enumerate(windows):
+        params = None
+        if mode == "fixed_params":
+            params = _full_sample_oos_params(full_sample_fits[name])
+            store["n_refiltered"] += 1
+        elif store_dir is not None:
             corr = model_corrections[name]
-            try:
-                # Use dummy-corrected y and non-dummy exog
-                y_adj_train = corr["y_adj"][train_mask].copy()
-                y_adj_test = corr["y_adj"][test_mask]
-                non_dummy_cols = corr["non_dummy_cols"]
-
-                X_train = train_subset[non_dummy_cols].astype(float)
-                X_test = test_subset[non_dummy_cols].astype(float)
-
-                fitted = _fit_model(y_adj_train, X_train, spec["order"], spec["seasonal_order"])
-                pred = fitted.get_forecast(steps=n_test, exog=X_test)
-                pred_real = np.exp(pred.predicted_mean).values
-
-                # Actuals also dummy-corrected (fair comparison)
-                actual_real = np.exp(y_adj_test.values)
-
-                sum_real = float(np.sum(actual_real))
-                sum_pred = float(np.sum(pred_real))
-                mape = abs((sum_real - sum_pred) / sum_real) * 100 if sum_real != 0 else None
-
-                model_results[name]["predictions"][cutoff_str] = pred_real
-                model_results[name]["actuals"][cutoff_str] = actual_real
-                if mape is not None:
-                    model_results[name]["window_mapes"].append(mape)
-                    model_results[name]["cutoff_dates"].append(cutoff_str)
-            except Exception:
+            cols = corr["non_dummy_cols"]
+            spec_cols = model_specs[name]["exog_cols"]
+            keys[i] = _oos_window_key(model_specs[name], y_full.iloc[train_rows].values,
+                                      train_df.iloc[train_rows][spec_cols].astype(float).values,
+                                      corr["dummy_coeffs"],
+                                      {"warm_start": warm_start, "maxiter": maxiter})
+            entry = _read_oos_window(store_dir, keys[i])
+            if entry is not None:
+                X_test = train_df.iloc[test_rows][cols].astype(float).values
+                n_test = len(X_test)
+                stored_X = np.asarray(entry["x_test"], dtype=float).reshape(-1, len(cols))
+                if (len(entry["pred"]) >= n_test
+                        and np.array_equal(stored_X[:n_test], X_test, equal_nan=True)):
+                    results[i] = {"pred": np.asarray(entry["pred"][:n_test], dtype=float)}
+                    store["n_reused"] += 1
+                    continue
+                params = np.asarray(entry["params"], dtype=float)
+                store["n_refiltered"] += 1
+        tasks.append((name, cutoff_str, train_rows, test_rows, params))
+        task_pos.append(i)
+    store["n_fits"] = len(tasks) - store["n_refiltered"]
+
+    # Group tasks into chains: one window each, or a model's whole cutoff
+    # sequence when every fit warm-starts from the previous cutoff's.
+    chains, chain_pos = [], []
+    for name in model_corrections:
+        model_tasks = [(pos, task) for pos, task in zip(task_pos, tasks) if task[0] == name]
+        if not model_tasks:
+            continue
+        if warm_start == "previous_cutoff":
+            groups, start = [model_tasks], "previous"
+        else:
+            groups = [[mt] for mt in model_tasks]
+            start = (_full_sample_oos_params(full_sample_fits[name])
+                     if warm_start == "full_sample" else None)
+        for group in groups:
+            chains.append((name, [(train_rows, test_rows, params, start)
+                                  for _, (_, _, train_rows, test_rows, params) in group]))
+            chain_pos.append([pos for pos, _ in group])
+
+    chain_results, chain_timeouts = _run_oos_grid(train_df, model_corrections, model_specs,
+                                                  chains, max_workers=max_workers,
+                                                  maxiter=maxiter, fit_timeout=fit_timeout)
+    for c, timed_out in chain_timeouts.items():
+        for k in timed_out:
+            name, cutoff_str = windows[chain_pos[c][k]][:2]
+            store["skipped"].setdefault(name, {})[cutoff_str] = "timeout"
+            store["n_timed_out"] += 1
+
+    for positions, chain_out in zip(chain_pos, chain_results):
+        for i, window in zip(positions, chain_out):
+            results[i] = window
+            if window is None:
+                continue
+            name, cutoff_str, _, test_rows = windows[i]
+            if window["fit_seconds"] is not None:
+                stats = store["fit_stats"].setdefault(name, [])
+                stats.append((window["iterations"], window["converged"], window["fit_seconds"]))
+            if store_dir is None:
+                continue
+            cols = model_corrections[name]["non_dummy_cols"]
+            _write_oos_window(store_dir, keys[i], {
+                "model": name,
+                "cutoff": cutoff_str,
+                "exog_cols": cols,
+                "params": window["params"],
+                "iterations": window["iterations"],
+                "fit_seconds": window["fit_seconds"],
+                "x_test": train_df.iloc[test_rows][cols].astype(float).values,
+                "pred": window["pred"],
+            })
+
+    for (name, cutoff_str, _, test_rows), window in zip(windows, results):
+        if window is None:
+            continue
+        # Actuals also dummy-corrected (fair comparison)
+        actual_real = np.exp(model_corrections[name]["y_adj"].iloc[test_rows].values)
+        store["windows"][name][cutoff_str] = {"pred": window["pred"], "actual": actual_real}
+
+    return store
+
+
+def _summarize_fit_stats(fit_stats):
+    """Per-model optimizer iterations and wall time of the OOS window fits."""
+    summary = {}
+    all_rows = [row for rows in fit_stats.values() for row in rows]
+    for name, rows in [*fit_stats.items(), ("total", all_rows)]:
+        if not rows:
+            continue
+        iterations = [it for it, _, _ in rows if it is not None]
+        seconds = [sec for _, _, sec in rows]
+        summary[name] = {
+            "n_fits": len(rows),
+            "mean_iterations": round(float(np.mean(iterations)), 1) if iterations else None,
+            "max_iterations": int(max(iterations)) if iterations else None,
+            "n_not_converged": sum(1 for _, conv, _ in rows if conv is False),
+            "fit_seconds_total": round(float(np.sum(seconds)), 2),
+            "fit_seconds_mean": round(float(np.mean(seconds)), 3),
+        }
+    return summary
+
+
+def _slice_oos_windows(store, oos_horizon):
+    """Per-model expanding-window results for one horizon, sliced from the store.
+
+    Returns (model_results, effective_horizon, mode) where model_results is
+    keyed by model name with predictions, actuals, and MAPEs (None if the
+    sample is too short for this horizon) and mode is the store's OOS mode.
+    """
+    effective_horizon = store["effective_horizons"][oos_horizon]
+    latest_cutoff = store["last_obs"] - pd.DateOffset(months=effective_horizon)
+    if latest_cutoff <= store["first_valid_date"]:
+        return None, effective_horizon, store["mode"]
+
+    model_results = {
+        name: {"predictions": {}, "actuals": {}, "window_mapes": [], "cutoff_dates": [],
+               "skipped_windows": [{"train_end": cutoff_str, "reason": reason}
+                                   for cutoff_str, reason in
+                                   sorted(store.get("skipped", {}).get(name, {}).items())]}
+        for name in store["model_names"]
+    }
+    for name, windows in store["windows"].items():
+        # Windows were stored in cutoff order
+        for cutoff_str, window in windows.items():
+            if len(window["pred"]) < effective_horizon:
                 continue
+            pred_real = window["pred"][:effective_horizon]
+            actual_real = window["actual"][:effective_horizon]
+
+            sum_real = float(np.sum(actual_real))
+            sum_pred = float(np.sum(pred_real))
+            mape = abs((sum_real - sum_pred) / sum_real) * 100 if sum_real != 0 else None
+
+            model_results[name]["predictions"][cutoff_str] = pred_real
+            model_results[name]["actuals"][cutoff_str] = actual_real
+            if mape is not None:
+                model_results[name]["window_mapes"].append(mape)
+                model_results[name]["cutoff_dates"].append(cutoff_str)
+
+    return model_results, effective_horizon, store["mode"]
+
+
+def _run_all_expanding_windows(train_df, y_full, model_specs, full_sample_fits,
+                               oos_horizon, max_workers=1, max_windows=MAX_OOS_WINDOWS,
+                               mode="refit", fit_timeout=None):
+    """Run expanding-window OOS for ALL models for a single horizon.
 
+    Returns a dict keyed by model name with predictions, actuals, and MAPEs
+    (windows whose fit exceeded fit_timeout are listed in skipped_windows).
+    """
+    store = _build_oos_window_store(train_df, y_full, model_specs, full_sample_fits,
+                                    [oos_horizon], max_workers=max_workers,
+                                    max_windows=max_windows, mode=mode,
+                                    fit_timeout=fit_timeout)
+    model_results, effective_horizon, _ = _slice_oos_windows(store, oos_horizon)
     return model_results, effective_horizon
 
 
-def _build_oos_result_from_windows(model_window_data, effective_horizon):
+def _build_oos_result_from_windows(model_window_data, effective_horizon, mode="refit"):
     """Convert per-model expanding-window data into OOS result dict."""
     mape_values = model_window_data["window_mapes"]
     cutoff_dates = model_window_data["cutoff_dates"]
+    skipped = model_window_data.get("skipped_windows") or []
+    skipped_info = {"n_skipped": len(skipped), "skipped_windows": skipped} if skipped else {}
 
     if not mape_values:
-        return {"status": "no_valid_windows", "mape": None}
+        return {"status": "no_valid_windows", "mape": None, **skipped_info}
 
     return {
         "status": "ok",
@@ -375,88 +1981,637 @@ def _build_oos_result_from_windows(model_window_data, effective_horizon):
             {"train_end": cd, "mape": round(m, 2)}
             for cd, m in zip(cutoff_dates, mape_values)
         ],
+        **skipped_info,
         "method": "expanding_window_dummy_corrected",
+        "mode": mode,
         "note": (f"Expanding window: {len(mape_values)} janelas, horizonte {effective_horizon}m. "
                  f"Efeitos de dummies removidos usando coeficientes do sample completo. "
-                 f"MAPE = média dos MAPEs acumulados de {effective_horizon} meses."),
+                 + ("Parâmetros fixos do sample completo (só filtro de Kalman por janela). "
+                    if mode == "fixed_params" else "")
+                 + f"MAPE = média dos MAPEs acumulados de {effective_horizon} meses."),
     }
 
 
+ENSEMBLE_SUBSET_CHUNK = 4096  # subsets evaluated per batched pass
+
+
+def _search_ensembles_from_windows(model_window_data, members, combos):
+    """Ensemble MAPEs for many component subsets in batched NumPy passes.
+
+    Per-window predictions of `members` are packed once into a
+    (models, windows, horizon) tensor; for each subset (a tuple of member
+    names, in members order) every window is combined with inverse-MSE
+    weights and scored by accumulated MAPE, exactly as for a single
+    combination. Actuals come from the subset's first component and only
+    windows where all components have predictions count.
+
+    Returns a list aligned with combos of result dicts (None when a subset
+    has no common window).
+    """
+    n = len(members)
+    cutoffs = sorted({c for name in members for c in model_window_data[name]["predictions"]})
+    if not cutoffs or not combos:
+        return [None] * len(combos)
+    col = {c: j for j, c in enumerate(cutoffs)}
+    horizon = max(len(p) for name in members
+                  for p in model_window_data[name]["predictions"].values())
+
+    P = np.full((n, len(cutoffs), horizon), np.nan)
+    A = np.full((n, len(cutoffs), horizon), np.nan)
+    for i, name in enumerate(members):
+        for c, pred in model_window_data[name]["predictions"].items():
+            P[i, col[c], :len(pred)] = pred
+            actual = model_window_data[name]["actuals"][c]
+            A[i, col[c], :len(actual)] = actual
+    has = ~np.isnan(P).any(axis=2)                       # (n, W)
+    # MSE of model i against the actuals of model f, per window: (f, i, W)
+    mse = np.nanmean((A[:, None] - P[None]) ** 2, axis=3)
+    mse = np.maximum(np.nan_to_num(mse, nan=np.inf), 1e-10)
+    pred_sum = np.nansum(P, axis=2)                      # (n, W)
+    real_sum = np.nansum(A, axis=2)                      # (n, W)
+
+    index = {name: i for i, name in enumerate(members)}
+    results = []
+    for start in range(0, len(combos), ENSEMBLE_SUBSET_CHUNK):
+        chunk = combos[start:start + ENSEMBLE_SUBSET_CHUNK]
+        mask = np.zeros((len(chunk), n), dtype=bool)
+        for k, combo in enumerate(chunk):
+            mask[k, [index[name] for name in combo]] = True
+        first = mask.argmax(axis=1)                      # (S,)
+
+        inv = np.where(mask[:, :, None], 1.0 / mse[first], 0.0)   # (S, n, W)
+        weights = inv / inv.sum(axis=1, keepdims=True)
+        sum_pred = np.einsum("snw,nw->sw", weights, pred_sum)
+        sum_real = real_sum[first]                                 # (S, W)
+        valid = ~(mask[:, :, None] & ~has[None]).any(axis=1) & (sum_real != 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mape = np.abs((sum_real - sum_pred) / sum_real) * 100
+
+        for k, combo in enumerate(chunk):
+            w_idx = np.flatnonzero(valid[k])
+            if len(w_idx) == 0:
+                results.append(None)
+                continue
+            window_mapes = mape[k, w_idx]
+            last_w = weights[k, :, w_idx[-1]]
+            results.append({
+                "mape": round(float(np.mean(window_mapes)), 2),
+                "mape_std": round(float(np.std(window_mapes)), 2),
+                "n_windows": len(w_idx),
+                "weights": {name: round(float(last_w[index[name]]), 4) for name in combo},
+                "method": "inverse_mse",
+            })
+    return results
+
+
 def _compute_ensemble_mape_from_windows(model_window_data, component_names):
     """Compute ensemble MAPE from pre-computed individual model predictions.
 
     For each window, combines individual predictions with inverse-MSE weights
     and computes the accumulated MAPE. No re-fitting needed.
     """
-    # Find windows where ALL components have predictions
-    all_cutoffs = None
-    for name in component_names:
-        cutoffs = set(model_window_data[name]["predictions"].keys())
-        all_cutoffs = cutoffs if all_cutoffs is None else all_cutoffs & cutoffs
+    members = list(component_names)
+    return _search_ensembles_from_windows(model_window_data, members, [tuple(members)])[0]
+
+
+# Automated specification search (spec_search): screening grid and pruning.
+# The default grid (312 candidates) keeps D=0 -- seasonal differencing
+# over-differences this series (see MODEL_SPECS_PRIME) -- and at most 3 macro
+# regressors; pass spec_search_grid for a wider search over several runs
+# (the journal resumes it).
+SPEC_SEARCH_GRID = {
+    "p": [0, 1, 2], "d": [1], "q": [0, 1],
+    "P": [0, 1], "D": [0], "Q": [0],
+    "exog_pool": ["ibc_br", "ibc_br_lag1", "igp_di", "dias_uteis", "log_icms_lag12"],
+    "max_exog": 3,
+}
+SPEC_SEARCH_TOP_N = 5
+# Seconds for screening + OOS scoring, on top of the step's own fits/OOS/MC:
+# a fifth of the runner's default step timeout (600 s). A larger budget needs
+# a larger timeout_seconds on the step (see pipelines/v1.config.json).
+SPEC_SEARCH_BUDGET = 120
+SPEC_SEARCH_LB_ALPHA = 0.05     # screening: Ljung-Box (lag 12) p-value floor
+SPEC_SEARCH_AIC_MARGIN = 10.0   # screening: max AIC gap to the best comparable candidate
+SPEC_SEARCH_OOS_FACTOR = 4      # OOS-score at most top_n * factor survivors
+SPEC_SEARCH_VERSION = 2         # bump to invalidate search journals
 
-    if not all_cutoffs:
-        return None
+# Worker-side search data (set by _search_worker_init)
+_SEARCH_DATA = {}
 
-    window_mapes = []
-    last_weights = {}
-    for cutoff_str in sorted(all_cutoffs):
-        actuals = model_window_data[component_names[0]]["actuals"][cutoff_str]
-        preds = [model_window_data[n]["predictions"][cutoff_str] for n in component_names]
 
-        weights, _ = _compute_inverse_mse_weights(preds, actuals)
-        weighted_pred = np.zeros_like(preds[0])
-        for w, p in zip(weights, preds):
-            weighted_pred += w * p
+def _search_candidates(grid):
+    """(order, seasonal_order, exog_cols) candidates of a search grid, smallest first.
 
-        sum_real = float(np.sum(actuals))
-        sum_pred = float(np.sum(weighted_pred))
-        mape = abs((sum_real - sum_pred) / sum_real) * 100 if sum_real != 0 else None
+    grid overrides keys of SPEC_SEARCH_GRID. Exog subsets (up to max_exog
+    columns) come from exog_pool; the structural dummies are always in.
+    """
+    g = {**SPEC_SEARCH_GRID, **(grid or {})}
+    pool = list(g["exog_pool"])
+    subsets = [list(c) for k in range(min(int(g["max_exog"]), len(pool)) + 1)
+               for c in combinations(pool, k)]
+    candidates = [
+        ((p, d, q), (P, D, Q, 12), subset + DUMMY_COLS)
+        for p in g["p"] for d in g["d"] for q in g["q"]
+        for P in g["P"] for D in g["D"] for Q in g["Q"]
+        for subset in subsets
+    ]
+    # Fewest parameters first, so a budget-limited search covers the small models
+    candidates.sort(key=lambda c: c[0][0] + c[0][2] + c[1][0] + c[1][2] + len(c[2]))
+    return candidates
 
-        if mape is not None:
-            window_mapes.append(mape)
-            last_weights = {n: round(w, 4) for n, w in zip(component_names, weights)}
 
-    if not window_mapes:
-        return None
+def _search_key(order, seasonal_order, exog_cols):
+    return f"{tuple(order)}{tuple(seasonal_order)}|{','.join(exog_cols)}"
 
-    return {
-        "mape": round(float(np.mean(window_mapes)), 2),
-        "mape_std": round(float(np.std(window_mapes)), 2),
-        "n_windows": len(window_mapes),
-        "weights": last_weights,
-        "method": "inverse_mse",
-    }
 
+def _search_description(order, seasonal_order, exog_cols):
+    macro = [c for c in exog_cols if c not in DUMMY_COLS]
+    arima = "SARIMAX({},{},{})({},{},{})".format(*order, *seasonal_order[:3])
+    return f"{arima} + {', '.join(macro) if macro else 'Dummies'}"
 
-def _load(od: Path, name: str) -> dict:
-    f = od / f"{name}.json"
-    return json.loads(f.read_text()) if f.exists() else {}
 
+def _search_journal_path(journal_dir, y, X):
+    """Journal file for this training data (content hash of y and the exog pool)."""
+    h = hashlib.sha256()
+    h.update(json.dumps({"version": SPEC_SEARCH_VERSION,
+                         "statsmodels": statsmodels.__version__,
+                         "columns": list(X.columns)}).encode("utf-8"))
+    h.update(np.ascontiguousarray(y, dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(X, dtype=np.float64).tobytes())
+    return Path(journal_dir) / f"{h.hexdigest()[:16]}.jsonl"
 
-def main(*, output_dir: str = "", **kwargs) -> dict:
-    """Run all SARIMAX models with Monte Carlo simulation and OOS validation."""
-    od = Path(output_dir)
 
-    base = _load(od, "prepare_base")
+def _read_search_journal(path):
+    """{(stage, key): entry} from a search journal; a torn last line is ignored."""
+    entries = {}
+    try:
+        lines = path.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return entries
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        entries[(entry["stage"], entry["key"])] = entry
+    return entries
 
-    train_records = base.get("train_data", [])
-    future_records = base.get("future_data", [])
 
-    if not train_records:
-        return {"status": "error", "message": "No training data available"}
+def _search_worker_init(y, X):
+    """Pool initializer: training series and the exog pool for screening fits."""
+    _SEARCH_DATA["y"], _SEARCH_DATA["X"] = y, X
 
-    train_df = pd.DataFrame(train_records)
-    train_df["data"] = pd.to_datetime(train_df["data"])
 
-    # --- Change 3: Forecast horizon ---
-    # Find last ICMS observation date, forecast from next month to Dec of following year
+def _search_screen_task(order, seasonal_order, exog_cols):
+    """Screening fit of one candidate: AIC/BIC, effective nobs, Ljung-Box (lag 12), params."""
+    t0 = time.perf_counter()
+    try:
+        result = _fit_model(_SEARCH_DATA["y"], _SEARCH_DATA["X"][list(exog_cols)],
+                            order, seasonal_order)
+        resid = result.resid[result.resid.notna()]
+        lb_pval = float(acorr_ljungbox(resid, lags=[12], return_df=True)["lb_pvalue"].iloc[-1])
+        retvals = getattr(result, "mle_retvals", None) or {}
+        return {"aic": float(result.aic), "bic": float(result.bic),
+                "nobs_effective": int(result.nobs_effective),
+                "lb_pvalue": lb_pval if np.isfinite(lb_pval) else None,
+                "converged": retvals.get("converged"),
+                "params": np.asarray(result.params, dtype=float).tolist(),
+                "fit_seconds": round(time.perf_counter() - t0, 3)}
+    except Exception as exc:
+        return {"error": str(exc), "fit_seconds": round(time.perf_counter() - t0, 3)}
+
+
+def _run_spec_search(train_df, y, grid=None, top_n=SPEC_SEARCH_TOP_N, budget=SPEC_SEARCH_BUDGET,
+                     max_workers=1, journal_dir=None, oos_horizon=12, oos_options=None):
+    """Automated SARIMAX specification search.
+
+    1. Screening: fit every grid candidate (_search_candidates) on the full
+       sample, on a process pool when max_workers > 1.
+    2. Pruning: keep candidates whose Ljung-Box p-value (lag 12) is at least
+       SPEC_SEARCH_LB_ALPHA and whose AIC is within SPEC_SEARCH_AIC_MARGIN
+       of the best candidate with the same differencing and effective
+       sample (nobs after the rows dropped for lagged exog and the diffuse
+       burn-in; AIC is only comparable there); at most
+       top_n * SPEC_SEARCH_OOS_FACTOR, by AIC gap.
+    3. Scoring: expanding-window OOS MAPE of the survivors at oos_horizon
+       (_build_oos_window_store with oos_options), in chunks of max_workers
+       specs.
+
+    Both stages stop once budget seconds have elapsed (in-flight fits
+    finish). Each result is appended to a JSONL journal under journal_dir,
+    keyed by the training data, so an interrupted or budget-limited search
+    resumes where it stopped. Returns the spec_search output block with the
+    top_n specs by OOS MAPE, in MODEL_SPECS format.
+    """
+    t_start = time.perf_counter()
+    deadline = t_start + float(budget)
+    candidates = _search_candidates(grid)
+    pool_cols = list(dict.fromkeys(col for _, _, cols in candidates for col in cols))
+    X_pool = train_df[pool_cols].astype(float)
+
+    journal_path = None
+    entries = {}
+    if journal_dir is not None:
+        journal_path = _search_journal_path(journal_dir, y, X_pool)
+        entries = _read_search_journal(journal_path)
+        journal_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def record(stage, key, entry):
+        entry = {"stage": stage, "key": key, **entry}
+        entries[(stage, key)] = entry
+        if journal_path is not None:
+            with open(journal_path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(entry, cls=_NumpyEncoder) + "\n")
+
+    # --- 1. Screening fits ---
+    todo = [c for c in candidates if ("screen", _search_key(*c)) not in entries]
+    n_from_journal = len(candidates) - len(todo)
+    if max_workers > 1 and len(todo) > 1:
+        with _process_pool(max_workers, _search_worker_init, (y, X_pool)) as pool:
+            pending, queue = {}, iter(todo)
+            while True:
+                while len(pending) < 2 * max_workers and time.perf_counter() < deadline:
+                    cand = next(queue, None)
+                    if cand is None:
+                        break
+                    pending[pool.submit(_perf_task, _search_screen_task, _PERF["stage"],
+                                        *cand)] = cand
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record("screen", _search_key(*pending.pop(future)),
+                           _perf_result(future.result()))
+    else:
+        _search_worker_init(y, X_pool)
+        for cand in todo:
+            if time.perf_counter() >= deadline:
+                break
+            record("screen", _search_key(*cand), _search_screen_task(*cand))
+    screened = [(c, entries[("screen", _search_key(*c))]) for c in candidates
+                if ("screen", _search_key(*c)) in entries]
+
+    # --- 2. Pruning on Ljung-Box and AIC ---
+    passed = [(c, e) for c, e in screened
+              if "aic" in e and np.isfinite(e["aic"]) and e["lb_pvalue"] is not None
+              and e["lb_pvalue"] >= SPEC_SEARCH_LB_ALPHA]
+
+    def group(cand, entry):
+        return cand[0][1], cand[1][1], entry["nobs_effective"]
+
+    best_aic = {}
+    for c, e in passed:
+        best_aic[group(c, e)] = min(best_aic.get(group(c, e), np.inf), e["aic"])
+    survivors = sorted(
+        ((e["aic"] - best_aic[group(c, e)], c, e) for c, e in passed
+         if e["aic"] - best_aic[group(c, e)] <= SPEC_SEARCH_AIC_MARGIN),
+        key=lambda t: t[0],
+    )[:int(top_n) * SPEC_SEARCH_OOS_FACTOR]
+
+    # --- 3. OOS scoring of the survivors ---
+    oos_options = oos_options or {}
+    oos_tag = json.dumps({"horizon": oos_horizon,
+                          **{k: v for k, v in oos_options.items() if k != "store_dir"}},
+                         sort_keys=True, default=str)
+    chunk_size = max(1, max_workers)
+    for start in range(0, len(survivors), chunk_size):
+        chunk = [(c, e) for _, c, e in survivors[start:start + chunk_size]
+                 if ("oos", _search_key(*c) + oos_tag) not in entries]
+        if not chunk:
+            continue
+        if time.perf_counter() >= deadline:
+            break
+        specs, fits = {}, {}
+        for (order, seasonal_order, exog_cols), e in chunk:
+            key = _search_key(order, seasonal_order, exog_cols)
+            specs[key] = {"order": order, "seasonal_order": seasonal_order, "exog_cols": exog_cols}
+            fits[key] = _fit_model(y, X_pool[exog_cols], order, seasonal_order, params=e["params"])
+        store = _build_oos_window_store(train_df, y, specs, fits, [oos_horizon],
+                                        max_workers=max_workers, **oos_options)
+        data, eff_h, mode = _slice_oos_windows(store, oos_horizon)
+        for key in specs:
+            mape = (_build_oos_result_from_windows(data[key], eff_h, mode)["mape"]
+                    if data and key in data else None)
+            record("oos", key + oos_tag, {"oos_mape": mape, "oos_horizon": eff_h})
+
+    scored = []
+    for gap, c, e in survivors:
+        oos = entries.get(("oos", _search_key(*c) + oos_tag))
+        if oos is not None and oos["oos_mape"] is not None:
+            scored.append((oos["oos_mape"], gap, c, e, oos))
+    scored.sort(key=lambda t: (t[0], t[1]))
+
+    top_specs = {}
+    for rank, (mape, gap, (order, seasonal_order, exog_cols), e, oos) in enumerate(
+            scored[:int(top_n)], start=1):
+        top_specs[f"Busca {rank}"] = {
+            "order": order,
+            "seasonal_order": seasonal_order,
+            "exog_cols": exog_cols,
+            "description": _search_description(order, seasonal_order, exog_cols),
+            "search": {
+                "aic": round(e["aic"], 2),
+                "aic_gap": round(gap, 2),
+                "bic": round(e["bic"], 2),
+                "ljung_box_pvalue": round(e["lb_pvalue"], 4),
+                "oos_mape": mape,
+                "oos_horizon_months": oos["oos_horizon"],
+            },
+        }
+    n_screen_errors = sum(1 for _, e in screened if "error" in e)
+    return {
+        "grid": {**SPEC_SEARCH_GRID, **(grid or {})},
+        "n_candidates": len(candidates),
+        "n_screened": len(screened),
+        "n_from_journal": n_from_journal,
+        "n_screen_errors": n_screen_errors,
+        "n_passed_ljung_box": len(passed),
+        "n_survivors": len(survivors),
+        "n_oos_scored": len(scored),
+        "budget_s": float(budget),
+        "elapsed_s": round(time.perf_counter() - t_start, 1),
+        "budget_exhausted": len(screened) < len(candidates) or len(scored) < len(survivors),
+        "journal": str(journal_path) if journal_path else None,
+        "top_specs": top_specs,
+    }
+
+
+def _iter_fit_and_simulate_spec(name, spec, train_df, future_df, n_simulations, seed,
+                                mc_adaptive=None, mc_sampler="normal",
+                                mc_block_length=MC_BLOCK_LENGTH, fit_cache_dir=None):
+    """Fit one spec on the full sample: diagnostics, coefficients, forecast, MC.
+
+    Generator of two items, so _run_timed_tasks can time the fit alone: a
+    {"name", "phase": "fit"} marker once the model is estimated, then the
+    output dict below (only the latter if the fit itself fails).
+
+    Top-level (picklable) so it can run in a worker process. Returns a dict
+    with the fitted result and every per-model output block, or
+    ``{"name", "error"}`` if the fit fails. mc_adaptive ({"batch_size",
+    "max_simulations", "tolerance"}) switches to the adaptive MC; the
+    simulation inputs are returned so paths can be topped up later.
+    fit_cache_dir enables the fit cache; the returned "fit_cache" holds
+    this spec's hit/miss counts.
+    """
+    fit_cache = {}
+    try:
+        y = np.log(train_df["icms_sp"].astype(float))
+        n_future = len(future_df)
+        X_train = train_df[spec["exog_cols"]].astype(float)
+        result = _fit_model(y, X_train, spec["order"], spec["seasonal_order"],
+                            cache_dir=fit_cache_dir, cache_stats=fit_cache)
+        yield {"name": name, "phase": "fit"}
+
+        # Diagnostics — Ljung-Box with NaN-safe residual handling
+        resid = result.resid.copy()
+        resid = resid[resid.notna()]  # drop any NaN residuals
+
+        lb_pval = None
+        lb_error = None
+        try:
+            # Use lags=[12] (list) to avoid issues with short series
+            lb = acorr_ljungbox(resid, lags=[12], return_df=True)
+            lb_pval = float(lb["lb_pvalue"].iloc[-1])
+            if np.isnan(lb_pval):
+                lb_pval = None
+                lb_error = "Ljung-Box returned NaN p-value"
+        except Exception as lb_exc:
+            lb_error = f"Ljung-Box error: {lb_exc}"
+
+        diag_entry = {
+            "aic": round(_to_python(result.aic), 2),
+            "bic": round(_to_python(result.bic), 2),
+            "loglik": round(_to_python(result.llf), 2),
+            "n_obs": _to_python(result.nobs),
+            "n_resid_used": len(resid),
+            "description": spec["description"],
+            "mape": None,  # filled after expanding-window OOS
+            "oos_validation": None,
+        }
+        if lb_pval is not None:
+            diag_entry["ljung_box_p"] = round(lb_pval, 4)
+            diag_entry["ljung_box_pass"] = lb_pval > 0.05
+        else:
+            diag_entry["ljung_box_p"] = None
+            diag_entry["ljung_box_pass"] = None
+            diag_entry["ljung_box_error"] = lb_error
+
+        # Coefficients
+        model_entry = {
+            "specification": spec["description"],
+            "order": list(spec["order"]),
+            "seasonal_order": list(spec["seasonal_order"]),
+            "exog_cols": spec["exog_cols"],
+            "coefficients": {k: round(_to_python(v), 6) for k, v in result.params.items()},
+        }
+
+        # Forecast (point estimate + analytical CI — kept for backward compat)
+        X_future = _build_future_exog(result, spec, future_df, n_future)
+
+        with _perf_span("forecast"):
+            forecast = result.get_forecast(steps=n_future, exog=X_future)
+        predicted = np.exp(forecast.predicted_mean).values
+
+        # Analytical confidence intervals
+        ci = forecast.conf_int()
+        ci_lower = np.exp(ci.iloc[:, 0]).values
+        ci_upper = np.exp(ci.iloc[:, 1]).values
+
+        forecasts = []
+        for i, row in future_df.iterrows():
+            idx = i - future_df.index[0]
+            forecasts.append({
+                "data": row["data"].strftime("%Y-%m-%d"),
+                "forecast": round(_to_python(predicted[idx]), 2),
+                "ci_lower": round(_to_python(ci_lower[idx]), 2),
+                "ci_upper": round(_to_python(ci_upper[idx]), 2),
+            })
+
+        # --- Monte Carlo simulation ---
+        # M' specs: paths feed their own values back into the unknown lag-12 steps
+        lag12_feedback = None
+        if "log_icms_lag12" in spec["exog_cols"]:
+            lag12_feedback = future_df["log_icms_lag12"].isna().values
+        n_converged = None
+        mc_fallback = {}
+        if mc_adaptive:
+            sims, n_converged = _run_monte_carlo_adaptive(
+                result, n_future, X_future, future_df["data"].dt.year.values, seed=seed,
+                lag12_feedback=lag12_feedback, sampler=mc_sampler,
+                block_length=mc_block_length, fallback=mc_fallback, **mc_adaptive,
+            )
+        elif mc_sampler in QMC_SAMPLERS:
+            # One independently scrambled point set per batch (replicate)
+            sims = _run_monte_carlo_batches(
+                result, n_future, X_future, seed, _qmc_replicate_size(n_simulations, mc_sampler),
+                range(MC_QMC_REPLICATES), lag12_feedback=lag12_feedback, sampler=mc_sampler,
+                fallback=mc_fallback,
+            )
+        else:
+            sims = _run_monte_carlo(result, n_future, X_future, n_simulations, seed=seed,
+                                    lag12_feedback=lag12_feedback, sampler=mc_sampler,
+                                    block_length=mc_block_length, fallback=mc_fallback)
+        diag_entry["monte_carlo"] = "ok" if sims is not None else "simulation_failed"
+
+        yield {
+            "name": name,
+            "result": result,
+            "diagnostics": diag_entry,
+            "model": model_entry,
+            "forecasts": forecasts,
+            "sims": sims,
+            "mc_converged_at": n_converged,
+            "mc_fallback": mc_fallback.get("reason"),
+            "mc_inputs": (X_future, lag12_feedback),
+            "fit_cache": fit_cache,
+        }
+    except Exception as e:
+        yield {"name": name, "error": str(e), "fit_cache": fit_cache}
+
+
+def _fit_and_simulate_spec(*args, **kwargs):
+    """Output dict of _iter_fit_and_simulate_spec (its last item)."""
+    *_, out = _iter_fit_and_simulate_spec(*args, **kwargs)
+    return out
+
+
+def _load(od: Path, name: str) -> dict:
+    f = od / f"{name}.json"
+    return json.loads(f.read_text()) if f.exists() else {}
+
+
+def main(*, output_dir: str = "", max_workers: int = 1, seed: int | None = None,
+         oos_max_windows: int | None = MAX_OOS_WINDOWS, oos_cache: bool = True,
+         cache_dir: str = "", oos_warm_start: str = "none", oos_maxiter: int | None = None,
+         oos_mode: str = "refit", mc_adaptive: bool = False,
+         mc_tolerance: float = MC_TOLERANCE, mc_batch_size: int = MC_BATCH_SIZE,
+         mc_max_simulations: int = MC_MAX_SIMULATIONS, mc_sampler: str = "normal",
+         mc_block_length: int = MC_BLOCK_LENGTH, scenario_grid: dict | None = None,
+         sensitivity_grid: list | None = None, spec_search: bool = False,
+         spec_search_grid: dict | None = None, spec_search_top_n: int = SPEC_SEARCH_TOP_N,
+         spec_search_budget: float = SPEC_SEARCH_BUDGET, fit_cache: bool = True,
+         fit_cache_max_mb: float = FIT_CACHE_MAX_MB, models_to_run: list | None = None,
+         n_simulations: int = N_SIMULATIONS, horizons: list | None = None,
+         materialize_horizons: list | None = None, fit_timeout: float | None = None,
+         **kwargs) -> dict:
+    """Run all SARIMAX models with Monte Carlo simulation and OOS validation.
+
+    Step args:
+      models_to_run: models to fit, simulate and validate (default: all
+        specs). 3, "3", "M3" and "Modelo 3" all select Modelos 3 and 3';
+        "3'" selects only the prime. Unknown entries are an error.
+        Ensembles are built from the selected models only.
+      n_simulations: Monte Carlo paths per model (fixed-size MC; the
+        adaptive mode is capped by mc_max_simulations instead).
+      horizons: OOS validation horizons in months (or "short"/"long"); the
+        forecast and MC run once to the longest and every horizon's OOS
+        metrics and ensemble ranking are sliced from one window store. The
+        first horizon backs the top-level (backward-compat) keys.
+      materialize_horizons: horizon keys ("short", "long", "<n>m") that also
+        get the ensemble point forecast, MC bands and annual totals
+        (default: short and long, the ones the render steps ask for; the
+        first horizon is always materialized).
+      max_workers: >1 fits the model specs and the OOS (cutoff x model) grid
+        on a process pool (opt-in).
+      seed: Monte Carlo base seed; drawn at random (and reported) if omitted.
+      oos_max_windows: cap on OOS cutoffs per horizon; 0 evaluates every
+        monthly cutoff (practical with max_workers > 1).
+      oos_cache: persist OOS windows across runs and only fit new/changed ones.
+      cache_dir: cache root (default: workspace/cache of the project).
+      fit_cache: reuse full-sample fits from <cache_dir>/fits when the spec,
+        y, exog matrix and statsmodels version are unchanged; the cache is
+        kept under fit_cache_max_mb by LRU eviction.
+      fit_timeout: wall-clock budget (s) per model fit -- each spec's
+        full-sample estimation (its diagnostics, forecast and MC are not
+        timed) and each OOS window fit -- enforced on killable worker
+        processes (also with max_workers=1). A spec whose fit exceeds it is
+        reported as failed (the step errors if no spec finishes); OOS
+        windows that do are skipped (oos_validation.skipped_windows).
+      oos_warm_start: OOS fit start values -- "none" (statsmodels defaults),
+        "full_sample" or "previous_cutoff".
+      oos_maxiter: optimizer iteration budget per OOS fit (default: statsmodels').
+      oos_mode: "refit" (re-estimate every window) or "fixed_params" (keep
+        full-sample parameters, only re-run the Kalman filter per cutoff).
+      mc_adaptive: simulate in batches of mc_batch_size paths until the
+        annual p5/p50/p95 change by less than mc_tolerance (relative) between
+        batches, up to mc_max_simulations paths per model.
+      mc_sampler: MC shock generator -- "normal", "antithetic", "sobol" or
+        "halton" (variance reduction for the CI bands), or "bootstrap" /
+        "block_bootstrap" (resample the model's standardized residuals
+        instead of Gaussian shocks; mc_block_length months per block).
+        The QMC samplers draw MC_QMC_REPLICATES independently scrambled
+        point sets (or one per adaptive batch), with Sobol set sizes rounded
+        up to a power of 2, so n_simulations / mc_batch_size may grow.
+      scenario_grid: {"pib_growth_pct": [...], "igpm_growth_pct": [...]} --
+        forecasts and MC annual bands of the best short-horizon candidate
+        for every combination, from the models already fitted (no refit).
+      sensitivity_grid: driver steps for the sensitivity table (default
+        SENSITIVITY_GRID; [] disables it).
+      spec_search: run the automated SARIMAX specification search
+        (_run_spec_search) over spec_search_grid (overrides of
+        SPEC_SEARCH_GRID) and report the spec_search_top_n best specs by
+        long-horizon OOS MAPE; spec_search_budget caps its wall time (s),
+        which comes on top of the regular fits -- the step's runner timeout
+        must leave room for it.
+    """
+    od = Path(output_dir)
+    t_wall, t_cpu = time.perf_counter(), time.process_time()
+    _perf_drain()
+    _PERF["stages"].clear()
+    if oos_warm_start not in OOS_WARM_START_MODES:
+        return {"status": "error",
+                "message": f"oos_warm_start must be one of {OOS_WARM_START_MODES}"}
+    if oos_mode not in OOS_MODES:
+        return {"status": "error", "message": f"oos_mode must be one of {OOS_MODES}"}
+    if mc_sampler not in MC_SAMPLERS:
+        return {"status": "error", "message": f"mc_sampler must be one of {MC_SAMPLERS}"}
+    try:
+        model_names = _select_model_names(models_to_run)
+    except ValueError as e:
+        return {"status": "error", "message": f"invalid models_to_run: {e}"}
+    model_specs = {name: ALL_MODEL_SPECS[name] for name in model_names}
+    n_simulations = max(1, int(n_simulations))
+    max_workers = max(1, int(max_workers or 1))
+    mc_seed = int(seed) if seed is not None else int(np.random.SeedSequence().entropy % 2**63)
+
+    base = _load(od, "prepare_base")
+
+    train_records = base.get("train_data", [])
+    future_records = base.get("future_data", [])
+
+    if not train_records:
+        return {"status": "error", "message": "No training data available"}
+
+    train_df = pd.DataFrame(train_records)
+    train_df["data"] = pd.to_datetime(train_df["data"])
+
+    # --- Change 3: Forecast horizon ---
+    # Find last ICMS observation date, forecast from next month to Dec of following year
     last_icms_date = train_df["data"].max()
     forecast_start = last_icms_date + pd.DateOffset(months=1)
     forecast_end_year = last_icms_date.year + 1
     forecast_end = pd.Timestamp(f"{forecast_end_year}-12-31")
 
-    full_future_df = pd.DataFrame(future_records)
+    short_months = 12 - last_icms_date.month  # rest of current year
+    long_months = short_months + 12  # rest of current year + next full year
+    full_future_df = pd.DataFrame(future_records or {"data": []})
     full_future_df["data"] = pd.to_datetime(full_future_df["data"])
+    n_future_available = int((full_future_df["data"] >= forecast_start).sum())
+    try:
+        horizon_months = _resolve_horizons(horizons, short_months, long_months,
+                                           max_months=n_future_available or None)
+    except ValueError as e:
+        return {"status": "error", "message": f"invalid horizons {horizons!r}: {e}"}
+    max_horizon = max(horizon_months.values())
+    # Forecast and MC once, to the longest requested horizon
+    forecast_end = max(forecast_end, (forecast_start + pd.DateOffset(months=max_horizon - 1)
+                                      + pd.offsets.MonthEnd(0)))
+    primary_horizon = next(iter(horizon_months))
+    # Render steps name horizons by key; month counts are accepted too
+    materialize_keys = {primary_horizon} | {
+        next((k for k, m in horizon_months.items() if str(m) == str(item)), str(item))
+        for item in (["short", "long"] if materialize_horizons is None else materialize_horizons)
+    }
 
     # Filter future_data to the desired horizon
     future_df = full_future_df[
@@ -464,6 +2619,11 @@ def main(*, output_dir: str = "", **kwargs) -> dict:
         (full_future_df["data"] <= forecast_end)
     ].copy().reset_index(drop=True)
 
+    if len(future_df) < max_horizon and not future_df.empty:
+        return {"status": "error",
+                "message": (f"Longest horizon ({max_horizon} months) exceeds future_data "
+                            f"({len(future_df)} months from {forecast_start.strftime('%Y-%m')}); "
+                            f"extend prepare_base horizon_end")}
     if future_df.empty:
         return {
             "status": "error",
@@ -474,9 +2634,6 @@ def main(*, output_dir: str = "", **kwargs) -> dict:
             )
         }
 
-    # Run all models (originals + primes)
-    model_names = list(ALL_MODEL_SPECS.keys())
-
     y = np.log(train_df["icms_sp"].astype(float))
     n_future = len(future_df)
 
@@ -486,182 +2643,257 @@ def main(*, output_dir: str = "", **kwargs) -> dict:
     models_output = {}
     forecasts_output = {}
     diagnostics_output = {}
-    # Monte Carlo: collect simulation paths per model (real scale, shape: [N_SIMULATIONS, n_future])
+    # Monte Carlo: collect simulation paths per model (real scale, shape: [n_simulations, n_future])
     mc_simulations = {}
+    mc_converged_at = {}
+    mc_fallbacks = {}   # model -> batch engine error, when statsmodels simulate was used
+    mc_inputs = {}
     # Per-model OOS MAPE (for ensemble building)
     individual_mapes = {}
     # Store full-sample fits for dummy pre-correction in OOS
     full_sample_fits = {}
 
-    for name in model_names:
-        spec = ALL_MODEL_SPECS.get(name)
-        if not spec:
+    # Fit + diagnostics + forecast + MC per spec — serial by default, or on a
+    # process pool when max_workers > 1. Each spec draws from its own seed, so
+    # results do not depend on worker count or completion order.
+    mc_batch_size = max(1, int(mc_batch_size))
+    # QMC: adaptive batches / fixed-size replicates are independent scrambles;
+    # Sobol sizes go up to a power of 2. mc_se_batch splits paths for the SE.
+    mc_se_batch = mc_batch_size
+    if mc_sampler in QMC_SAMPLERS:
+        if mc_adaptive:
+            mc_batch_size = mc_se_batch = _qmc_replicate_size(mc_batch_size, mc_sampler, 1)
+        else:
+            mc_se_batch = _qmc_replicate_size(n_simulations, mc_sampler)
+            n_simulations = mc_se_batch * MC_QMC_REPLICATES
+    mc_adaptive_opts = None
+    if mc_adaptive:
+        mc_adaptive_opts = {"batch_size": mc_batch_size,
+                            "max_simulations": int(mc_max_simulations),
+                            "tolerance": float(mc_tolerance)}
+    cache_root = Path(cache_dir) if cache_dir else _default_cache_dir(od)
+    fit_cache_dir = cache_root / "fits" if fit_cache else None
+    spec_tasks = [
+        (name, spec, train_df, future_df, n_simulations,
+         _model_seed(mc_seed, name), mc_adaptive_opts, mc_sampler, int(mc_block_length),
+         fit_cache_dir)
+        for name, spec in model_specs.items()
+    ]
+    fit_timeout = float(fit_timeout) if fit_timeout else None
+    with _perf_stage("full_sample"):
+        if fit_timeout:
+            # Only the fit item is timed; diagnostics, forecast and MC run unbounded
+            spec_items, spec_timeouts = _run_timed_tasks(
+                [(_iter_fit_and_simulate_spec, task, 2) for task in spec_tasks],
+                max_workers, fit_timeout, timed_items=1)
+            spec_outputs = []
+            for t, (task, items) in enumerate(zip(spec_tasks, spec_items)):
+                out = next((it for it in items if it is not None and "phase" not in it), None)
+                if out is None:
+                    error = (f"fit timed out after {fit_timeout:g}s" if t in spec_timeouts
+                             else "worker failed after the fit (forecast / Monte Carlo)"
+                             if items[0] is not None else "fit worker failed")
+                    out = {"name": task[0], "fit_cache": {}, "error": error}
+                spec_outputs.append(out)
+        elif max_workers > 1 and len(spec_tasks) > 1:
+            with _process_pool(max_workers) as pool:
+                spec_outputs = [_perf_result(out) for out in pool.map(
+                    _perf_task, *zip(*[(_fit_and_simulate_spec, "full_sample", *task)
+                                       for task in spec_tasks]))]
+        else:
+            spec_outputs = [_fit_and_simulate_spec(*task) for task in spec_tasks]
+
+    # Merge in model_names order (pool.map preserves submission order)
+    fit_cache_stats = {"hits": 0, "misses": 0}
+    for out in spec_outputs:
+        name = out["name"]
+        for k, v in out.get("fit_cache", {}).items():
+            fit_cache_stats[k] += v
+        if "error" in out:
+            diagnostics_output[name] = {"error": out["error"]}
+            models_output[name] = {"error": out["error"]}
             continue
-
-        try:
-            X_train = train_df[spec["exog_cols"]].astype(float)
-            result = _fit_model(y, X_train, spec["order"], spec["seasonal_order"])
-            full_sample_fits[name] = result
-
-            # Diagnostics — Ljung-Box with NaN-safe residual handling
-            resid = result.resid.copy()
-            resid = resid[resid.notna()]  # drop any NaN residuals
-
-            lb_pval = None
-            lb_error = None
-            try:
-                # Use lags=[12] (list) to avoid issues with short series
-                lb = acorr_ljungbox(resid, lags=[12], return_df=True)
-                lb_pval = float(lb["lb_pvalue"].iloc[-1])
-                if np.isnan(lb_pval):
-                    lb_pval = None
-                    lb_error = "Ljung-Box returned NaN p-value"
-            except Exception as lb_exc:
-                lb_error = f"Ljung-Box error: {lb_exc}"
-
-            diag_entry = {
-                "aic": round(_to_python(result.aic), 2),
-                "bic": round(_to_python(result.bic), 2),
-                "loglik": round(_to_python(result.llf), 2),
-                "n_obs": _to_python(result.nobs),
-                "n_resid_used": len(resid),
-                "description": spec["description"],
-                "mape": None,  # filled after expanding-window OOS
-                "oos_validation": None,
-            }
-            if lb_pval is not None:
-                diag_entry["ljung_box_p"] = round(lb_pval, 4)
-                diag_entry["ljung_box_pass"] = lb_pval > 0.05
-            else:
-                diag_entry["ljung_box_p"] = None
-                diag_entry["ljung_box_pass"] = None
-                diag_entry["ljung_box_error"] = lb_error
-
-            diagnostics_output[name] = diag_entry
-
-            # Coefficients
-            models_output[name] = {
-                "specification": spec["description"],
-                "order": list(spec["order"]),
-                "seasonal_order": list(spec["seasonal_order"]),
-                "exog_cols": spec["exog_cols"],
-                "coefficients": {k: round(_to_python(v), 6) for k, v in result.params.items()},
-            }
-
-            # Forecast (point estimate + analytical CI — kept for backward compat)
-            # For M' models with log_icms_lag12: build future lag12 values.
-            # Steps 1-12: lag12 = known historical log(ICMS) from 12 months ago.
-            # Steps 13+: lag12 = model's own forecast from 12 steps prior (recursive).
-            if "log_icms_lag12" in spec["exog_cols"]:
-                future_exog = future_df[spec["exog_cols"]].copy()
-                # First 12 steps: historical values (already in future_df from prepare_base)
-                # Beyond 12: fill recursively using point forecasts
-                lag12_vals = future_exog["log_icms_lag12"].values.copy()
-                # Do a recursive forecast: step by step for h > 12
-                # First pass: get forecast for steps where lag12 is known
-                known_mask = ~np.isnan(lag12_vals)
-                if not known_mask.all():
-                    # Recursive forecasting for steps where lag12 is unknown
-                    for step_idx in range(n_future):
-                        if np.isnan(lag12_vals[step_idx]):
-                            # lag12 for this step = forecast from step (step_idx - 12)
-                            src_idx = step_idx - 12
-                            if src_idx >= 0 and src_idx < len(lag12_vals):
-                                # Use point forecast from 12 steps ago (in log scale)
-                                future_exog_partial = future_exog.iloc[:step_idx].copy()
-                                future_exog_partial["log_icms_lag12"] = lag12_vals[:step_idx]
-                                partial_fc = result.get_forecast(
-                                    steps=step_idx, exog=future_exog_partial.astype(float)
-                                )
-                                lag12_vals[step_idx] = float(partial_fc.predicted_mean.iloc[src_idx])
-                    future_exog["log_icms_lag12"] = lag12_vals
-                X_future = future_exog.astype(float)
-            else:
-                X_future = future_df[spec["exog_cols"]].astype(float)
-
-            forecast = result.get_forecast(steps=n_future, exog=X_future)
-            predicted = np.exp(forecast.predicted_mean).values
-
-            # Analytical confidence intervals
-            ci = forecast.conf_int()
-            ci_lower = np.exp(ci.iloc[:, 0]).values
-            ci_upper = np.exp(ci.iloc[:, 1]).values
-
-            forecasts_output[name] = []
-            for i, row in future_df.iterrows():
-                idx = i - future_df.index[0]
-                forecasts_output[name].append({
-                    "data": row["data"].strftime("%Y-%m-%d"),
-                    "forecast": round(_to_python(predicted[idx]), 2),
-                    "ci_lower": round(_to_python(ci_lower[idx]), 2),
-                    "ci_upper": round(_to_python(ci_upper[idx]), 2),
-                })
-
-            # --- Monte Carlo simulation ---
-            sims = _run_monte_carlo(result, n_future, X_future, N_SIMULATIONS)
-            if sims is not None:
-                mc_simulations[name] = sims
-                diagnostics_output[name]["monte_carlo"] = "ok"
-            else:
+        full_sample_fits[name] = out["result"]
+        diagnostics_output[name] = out["diagnostics"]
+        models_output[name] = out["model"]
+        forecasts_output[name] = out["forecasts"]
+        if out["sims"] is not None:
+            mc_simulations[name] = out["sims"]
+            mc_converged_at[name] = out["mc_converged_at"]
+            if out["mc_fallback"] is not None:
+                mc_fallbacks[name] = out["mc_fallback"]
+            mc_inputs[name] = out["mc_inputs"]
+    if not full_sample_fits:
+        return {"status": "error",
+                "message": "no model finished its full-sample fit: " + "; ".join(
+                    f"{name}: {diag['error']}" for name, diag in diagnostics_output.items())}
+
+    # Adaptive MC: models stop at different path counts, but ensemble paths
+    # combine models path by path -- top every model up to the largest count
+    # with its next batches.
+    if mc_adaptive and mc_simulations:
+        n_paths = max(len(sims) for sims in mc_simulations.values())
+        for name, sims in list(mc_simulations.items()):
+            if len(sims) >= n_paths:
+                continue
+            X_future, lag12_feedback = mc_inputs[name]
+            with _perf_stage("full_sample"):
+                fallback = {}
+                extra = _run_monte_carlo_batches(
+                    full_sample_fits[name], n_future, X_future, _model_seed(mc_seed, name),
+                    mc_batch_size, range(len(sims) // mc_batch_size, n_paths // mc_batch_size),
+                    lag12_feedback=lag12_feedback, sampler=mc_sampler,
+                    block_length=int(mc_block_length), fallback=fallback,
+                )
+            if "reason" in fallback:
+                mc_fallbacks.setdefault(name, fallback["reason"])
+            if extra is None:
+                del mc_simulations[name]
                 diagnostics_output[name]["monte_carlo"] = "simulation_failed"
-
-        except Exception as e:
-            diagnostics_output[name] = {"error": str(e)}
-            models_output[name] = {"error": str(e)}
+            else:
+                mc_simulations[name] = np.concatenate([sims, extra])
 
     # =========================================================================
     # Expanding-window OOS validation (single pass for all models)
     # =========================================================================
     valid_models = [n for n in model_names if n in forecasts_output and isinstance(forecasts_output[n], list)]
 
-    # Run short horizon OOS (for backward-compat diagnostics)
-    short_months = 12 - last_icms_date.month  # rest of current year
-    short_oos_data, short_eff_h = _run_all_expanding_windows(
-        train_df, y, ALL_MODEL_SPECS, full_sample_fits, oos_horizon=short_months
-    )
+    # Fit each (model, cutoff) window once, forecasting to the longest horizon;
+    # every horizon (and the backward-compat diagnostics) slices from it.
+    oos_store_dir = cache_root / "oos_windows" if oos_cache else None
+    with _perf_stage("oos"):
+        oos_store = _build_oos_window_store(
+            train_df, y, model_specs, full_sample_fits, list(horizon_months.values()),
+            max_workers=max_workers, max_windows=oos_max_windows, store_dir=oos_store_dir,
+            warm_start=oos_warm_start, maxiter=oos_maxiter, mode=oos_mode,
+            fit_timeout=fit_timeout,
+        )
+    primary_oos_data, primary_eff_h, _ = _slice_oos_windows(
+        oos_store, horizon_months[primary_horizon])
 
-    # Update diagnostics with short-horizon OOS (backward compatibility)
+    # Update diagnostics with primary-horizon OOS (backward compatibility)
     for name in valid_models:
-        if short_oos_data and name in short_oos_data:
-            oos_result = _build_oos_result_from_windows(short_oos_data[name], short_eff_h)
+        if primary_oos_data and name in primary_oos_data:
+            oos_result = _build_oos_result_from_windows(primary_oos_data[name], primary_eff_h,
+                                                        mode=oos_mode)
         else:
             oos_result = {"status": "no_data", "mape": None}
         diagnostics_output[name]["mape"] = oos_result.get("mape")
         diagnostics_output[name]["oos_validation"] = oos_result
+    # Specs without a full-sample fit get no OOS windows (dummies are corrected
+    # with its coefficients); say so instead of leaving the entry bare
+    for name in model_names:
+        if name not in valid_models:
+            diagnostics_output[name]["mape"] = None
+            diagnostics_output[name]["oos_validation"] = {
+                "status": "no_oos_windows", "mape": None,
+                "reason": "full-sample fit failed",
+            }
 
     # =========================================================================
-    # Build results for TWO horizons
+    # Build results for every requested horizon
     # =========================================================================
-    long_months = short_months + 12  # rest of current year + next full year
 
-    horizon_short = _build_horizon_results(
-        train_df=train_df, y=y, valid_models=valid_models,
-        full_sample_fits=full_sample_fits, oos_horizon=short_months,
-        forecasts_output=forecasts_output, mc_simulations=mc_simulations,
-        future_df=future_df, n_future=n_future,
-        last_icms_date=last_icms_date, forecast_start=forecast_start,
-    )
-    horizon_long = _build_horizon_results(
-        train_df=train_df, y=y, valid_models=valid_models,
-        full_sample_fits=full_sample_fits, oos_horizon=long_months,
-        forecasts_output=forecasts_output, mc_simulations=mc_simulations,
-        future_df=future_df, n_future=n_future,
-        last_icms_date=last_icms_date, forecast_start=forecast_start,
-    )
+    # Per-model MC annual aggregation: one kernel pass shared by all horizons
+    mc_names = [n for n in valid_models if n in mc_simulations]
+    mc_annual = None
+    if mc_names:
+        current_year = last_icms_date.year
+        realized_current_year = float(
+            train_df.loc[train_df["data"].dt.year == current_year, "icms_sp"]
+            .astype(float).sum()
+        )
+        with _perf_span("aggregation"):
+            mc_agg = _aggregate_mc_paths(
+                np.stack([mc_simulations[n] for n in mc_names]),
+                future_df["data"].dt.year.values,
+                year_offsets={current_year: realized_current_year},
+            )
+        mc_annual = {"names": mc_names, "agg": mc_agg}
+
+    ensemble_aggs = {}
+    with _perf_stage("horizons"):
+        horizon_results = {
+            key: _build_horizon_results(
+                train_df=train_df, y=y, valid_models=valid_models,
+                full_sample_fits=full_sample_fits, oos_horizon=months,
+                forecasts_output=forecasts_output, mc_simulations=mc_simulations,
+                future_df=future_df, n_future=n_future,
+                last_icms_date=last_icms_date, forecast_start=forecast_start,
+                oos_store=oos_store, mc_annual=mc_annual,
+                materialize=key in materialize_keys, ensemble_aggs=ensemble_aggs,
+            )
+            for key, months in horizon_months.items()
+        }
+    horizon_primary = horizon_results[primary_horizon]
+
+    # =========================================================================
+    # MC paths per model — float32 sidecar shared across horizons
+    # =========================================================================
+    mc_paths_ref = None
+    if mc_annual is not None:
+        mc_paths_ref = _write_mc_paths(
+            od, mc_names, mc_simulations, future_df["data"].dt.strftime("%Y-%m-%d").tolist()
+        )
+
+    fit_cache_output = None
+    if fit_cache_dir is not None:
+        max_bytes = int(float(fit_cache_max_mb) * 1024 * 1024)
+        n_evicted, size_bytes = _evict_fit_cache(fit_cache_dir, max_bytes)
+        fit_cache_output = {"dir": str(fit_cache_dir), **fit_cache_stats,
+                            "evicted": n_evicted, "size_bytes": size_bytes,
+                            "max_bytes": max_bytes}
+
+    fitted_models_ref = None
+    if full_sample_fits:
+        fitted_models_ref = _write_fitted_models(od, full_sample_fits, train_df["data"])
 
     # =========================================================================
-    # MC annual paths per model — shared across horizons
+    # Scenario sweep — macro grid against the fitted models and their MC paths
     # =========================================================================
-    mc_paths_output = {}
-    for model_name, paths in mc_simulations.items():
-        annual_paths = {}
-        for year in sorted(set(future_df["data"].dt.year)):
-            year_mask = future_df["data"].dt.year == year
-            year_indices = [i for i, m in enumerate(year_mask) if m]
-            if year_indices:
-                year_sums = paths[:, year_indices].sum(axis=1)
-                annual_paths[str(year)] = [round(float(v) / 1e9, 2) for v in year_sums]
-        mc_paths_output[model_name] = annual_paths
+    current_year = last_icms_date.year
+    year_offsets = {current_year: float(train_df.loc[train_df["data"].dt.year == current_year,
+                                                     "icms_sp"].astype(float).sum())}
+    scenario_sweep = None
+    if scenario_grid and base.get("projection") and full_sample_fits:
+        with _perf_stage("scenario_sweep"):
+            scenario_sweep = _run_scenario_sweep(
+                _scenario_grid(scenario_grid, base.get("scenario_params", {})),
+                base["projection"], train_df, future_df, full_sample_fits, forecasts_output,
+                mc_simulations, mc_inputs, horizon_primary.get("_mc_models_used", []),
+                horizon_primary["ensemble_weighting"]["weights"], year_offsets,
+            )
+        scenario_sweep["best_model"] = horizon_primary["best_model"]
+        scenario_sweep["baseline"] = base.get("scenario_params")
+
+    # Automated specification search (journal under the cache dir, resumable)
+    spec_search_result = None
+    if spec_search:
+        with _perf_stage("spec_search"):
+            spec_search_result = _run_spec_search(
+                train_df, y, grid=spec_search_grid, top_n=spec_search_top_n,
+                budget=spec_search_budget, max_workers=max_workers,
+                journal_dir=cache_root / "spec_search", oos_horizon=long_months,
+                oos_options={"max_windows": oos_max_windows, "store_dir": oos_store_dir,
+                             "warm_start": oos_warm_start, "maxiter": oos_maxiter,
+                             "mode": oos_mode,
+                             **({"fit_timeout": fit_timeout} if fit_timeout else {})},
+            )
+
+    # Exog sensitivity: annual-total response per driver, model and best ensemble
+    sensitivity = None
+    if sensitivity_grid is None:
+        sensitivity_grid = SENSITIVITY_GRID
+    if sensitivity_grid and base.get("projection") and full_sample_fits:
+        ensemble_name = horizon_primary["best_model"]
+        if ensemble_name in full_sample_fits:
+            ensemble_name = None  # best candidate is a single model, already in the table
+        with _perf_stage("sensitivity"):
+            sensitivity = _run_sensitivity(
+                sensitivity_grid, base["projection"], base.get("scenario_params", {}),
+                train_df, future_df, full_sample_fits, forecasts_output, mc_inputs,
+                ensemble_name, horizon_primary["ensemble_weighting"]["weights"], year_offsets,
+            )
 
     # Model family metadata
     original_models = [n for n in model_names if n in MODEL_SPECS]
@@ -691,8 +2923,8 @@ def main(*, output_dir: str = "", **kwargs) -> dict:
     valid_diag = {n: d for n, d in diagnostics_output.items() if "aic" in d}
     best_model_aic = min(valid_diag, key=lambda n: valid_diag[n]["aic"]) if valid_diag else None
 
-    # Use short horizon as backward-compat default
-    short_mc_models = horizon_short.get("_mc_models_used", [])
+    # Use the primary horizon as backward-compat default
+    primary_mc_models = horizon_primary.get("_mc_models_used", [])
 
     result = {
         "models": models_output,
@@ -700,22 +2932,23 @@ def main(*, output_dir: str = "", **kwargs) -> dict:
         "diagnostics": diagnostics_output,
         # Horizon-specific results
         "horizons": {
-            "short": {k: v for k, v in horizon_short.items() if not k.startswith("_")},
-            "long": {k: v for k, v in horizon_long.items() if not k.startswith("_")},
+            key: {k: v for k, v in hz.items() if not k.startswith("_")}
+            for key, hz in horizon_results.items()
         },
-        # Backward compat — point to short horizon
-        "ensemble_mean": horizon_short["ensemble_mean"],
-        "confidence_intervals": horizon_short["confidence_intervals"],
-        "annual_totals": horizon_short["annual_totals"],
-        "best_model": horizon_short["best_model"],
-        "best_model_mape": horizon_short["best_model_mape"],
-        "all_candidates": horizon_short["all_candidates"],
-        "top5_ensembles": horizon_short["top5_ensembles"],
-        "ensemble_weighting": horizon_short["ensemble_weighting"],
+        "primary_horizon": primary_horizon,
+        # Backward compat — point to the primary (default: short) horizon
+        "ensemble_mean": horizon_primary["ensemble_mean"],
+        "confidence_intervals": horizon_primary["confidence_intervals"],
+        "annual_totals": horizon_primary["annual_totals"],
+        "best_model": horizon_primary["best_model"],
+        "best_model_mape": horizon_primary["best_model_mape"],
+        "all_candidates": horizon_primary["all_candidates"],
+        "top5_ensembles": horizon_primary["top5_ensembles"],
+        "ensemble_weighting": horizon_primary["ensemble_weighting"],
         "forecast_horizon": {
             "last_icms_observation": last_icms_date.strftime("%Y-%m-%d"),
             "forecast_start": forecast_start.strftime("%Y-%m-%d"),
-            "forecast_end": horizon_short["forecast_horizon"]["forecast_end"],
+            "forecast_end": horizon_primary["forecast_horizon"]["forecast_end"],
             "n_months": n_future,
         },
         "adf_test": {
@@ -724,13 +2957,58 @@ def main(*, output_dir: str = "", **kwargs) -> dict:
             "stationary": _to_python(adf_result[1]) < 0.05,
         },
         "monte_carlo_config": {
-            "n_simulations": N_SIMULATIONS,
+            "mode": "adaptive" if mc_adaptive else "fixed",
+            "sampler": mc_sampler,
+            **({"block_length": int(mc_block_length)} if mc_sampler == "block_bootstrap" else {}),
+            **({"qmc_replicates": MC_QMC_REPLICATES, "replicate_size": mc_se_batch}
+               if mc_sampler in QMC_SAMPLERS and not mc_adaptive else {}),
+            "n_simulations": (max((len(s) for s in mc_simulations.values()), default=0)
+                              if mc_adaptive else n_simulations),
+            **({"tolerance": float(mc_tolerance), "batch_size": mc_batch_size,
+                "max_simulations": int(mc_max_simulations)} if mc_adaptive else {}),
+            "models": {
+                name: {
+                    "n_paths": len(sims),
+                    **({"converged_at": mc_converged_at.get(name)} if mc_adaptive else {}),
+                    # Batch engine rejected the model: plain normal paths, no lag-12 feedback
+                    **({"sampler": "statsmodels_simulate", "fallback_reason": mc_fallbacks[name]}
+                       if name in mc_fallbacks else {}),
+                    "mc_se_bi": _mc_standard_errors(sims, future_df["data"].dt.year.values,
+                                                    mc_se_batch),
+                }
+                for name, sims in mc_simulations.items()
+            },
+            "seed": mc_seed,
             "percentiles_used": MC_PERCENTILES,
-            "models_simulated": len(short_mc_models),
-            "models_failed": len(valid_models) - len(short_mc_models),
-            "best_candidate_components": short_mc_models,
+            "models_simulated": len(primary_mc_models),
+            "models_failed": len(valid_models) - len(primary_mc_models),
+            "best_candidate_components": primary_mc_models,
+        },
+        "mc_paths": mc_paths_ref,
+        "fitted_models": fitted_models_ref,
+        "fit_cache": fit_cache_output,
+        "scenario_sweep": scenario_sweep,
+        "sensitivity": sensitivity,
+        "spec_search": spec_search_result,
+        "perf": _perf_summary(_perf_drain(), _PERF["stages"],
+                              time.perf_counter() - t_wall, time.process_time() - t_cpu),
+        "oos_config": {
+            "mode": oos_mode,
+            "max_windows": oos_max_windows,
+            "n_cutoffs": oos_store["n_cutoffs"],
+            "n_windows": oos_store["n_windows"],
+            "n_window_fits": oos_store["n_fits"],
+            "n_windows_reused": oos_store["n_reused"],
+            "n_windows_refiltered": oos_store["n_refiltered"],
+            "fit_timeout": fit_timeout,
+            "n_windows_timed_out": oos_store["n_timed_out"],
+            "store_dir": str(oos_store_dir) if oos_store_dir else None,
+            "warm_start": oos_warm_start,
+            "maxiter": oos_maxiter,
+            "fit_stats": _summarize_fit_stats(oos_store["fit_stats"]),
+            "max_forecast_months": max(oos_store["effective_horizons"].values()),
         },
-        "mc_annual_paths": mc_paths_output,
+        "models_to_run": model_names,
         "model_families": model_families,
         "n_models_fitted": len(valid_models),
         "status": "ok"
@@ -742,26 +3020,169 @@ def main(*, output_dir: str = "", **kwargs) -> dict:
     return result
 
 
+def _materialize_horizon(*, valid_models, forecasts_output, mc_simulations, mc_models_used,
+                         best_weights, train_df, future_df, n_future, last_icms_date,
+                         mc_annual=None, ensemble_aggs=None):
+    """Point forecast, MC confidence intervals and annual totals of one horizon's ensemble.
+
+    Returns {"ensemble_mean", "confidence_intervals", "annual_totals"}.
+    """
+    # =========================================================================
+    # Ensemble point forecasts — inverse-MSE weighted
+    # =========================================================================
+    ensemble = []
+    if valid_models:
+        n_periods = len(forecasts_output[valid_models[0]])
+        for i in range(n_periods):
+            date = forecasts_output[valid_models[0]][i]["data"]
+            if best_weights:
+                weighted_val = sum(
+                    best_weights.get(m, 0) * forecasts_output[m][i]["forecast"]
+                    for m in best_weights if m in forecasts_output
+                )
+                all_vals = [forecasts_output[m][i]["forecast"] for m in valid_models]
+                ensemble.append({
+                    "data": date,
+                    "forecast": round(_to_python(weighted_val), 2),
+                    "min": round(_to_python(np.min(all_vals)), 2),
+                    "max": round(_to_python(np.max(all_vals)), 2),
+                })
+            else:
+                values = [forecasts_output[m][i]["forecast"] for m in valid_models]
+                ensemble.append({
+                    "data": date,
+                    "forecast": round(_to_python(np.mean(values)), 2),
+                    "min": round(_to_python(np.min(values)), 2),
+                    "max": round(_to_python(np.max(values)), 2),
+                })
+
+    # =========================================================================
+    # Annual totals with realized ICMS for current year
+    # =========================================================================
+    annual_totals = {}
+    future_years = future_df["data"].dt.year.values
+
+    current_year = last_icms_date.year
+    realized_current_year = float(
+        train_df.loc[train_df["data"].dt.year == current_year, "icms_sp"]
+        .astype(float).sum()
+    )
+
+    # Ensemble MC paths and their aggregate; horizons that pick the same
+    # components and weights share one aggregate
+    mc_confidence_intervals = []
+    ensemble_agg = None
+    agg_key = (tuple(mc_models_used), tuple(best_weights.get(n) for n in mc_models_used))
+    if ensemble_aggs is not None and agg_key in ensemble_aggs:
+        ensemble_agg = ensemble_aggs[agg_key]
+    elif mc_models_used:
+        stacked = np.stack([mc_simulations[n] for n in mc_models_used], axis=0)
+        if best_weights and all(n in best_weights for n in mc_models_used):
+            mc_weights = np.array([best_weights[n] for n in mc_models_used])
+            mc_weights = mc_weights / mc_weights.sum()
+            mc_ensemble_paths = np.tensordot(mc_weights, stacked, axes=([0], [0]))
+        else:
+            mc_ensemble_paths = np.mean(stacked, axis=0)
+        with _perf_span("aggregation"):
+            ensemble_agg = _aggregate_mc_paths(
+                mc_ensemble_paths[None], future_years,
+                year_offsets={current_year: realized_current_year}, monthly=True,
+            )
+        if ensemble_aggs is not None:
+            ensemble_aggs[agg_key] = ensemble_agg
+
+    if ensemble_agg is not None:
+        monthly_pct = np.round(ensemble_agg["monthly_percentiles"][:, 0, :], 2)
+        future_dates = future_df["data"].dt.strftime("%Y-%m-%d").tolist()
+        for t in range(n_future):
+            entry = {"data": future_dates[t]}
+            for k, p in enumerate(MC_PERCENTILES):
+                entry[f"p{p}"] = float(monthly_pct[k, t])
+            mc_confidence_intervals.append(entry)
+
+    # Confidence intervals dict
+    confidence_intervals = {
+        "source": "monte_carlo_ensemble" if mc_confidence_intervals else "analytical_best_model",
+        "n_models_in_ensemble": len(mc_models_used),
+        "models_used": mc_models_used,
+    }
+    if mc_confidence_intervals:
+        confidence_intervals["intervals"] = mc_confidence_intervals
+
+    for name in valid_models + ["ensemble"]:
+        data = ensemble if name == "ensemble" else forecasts_output.get(name, [])
+        if not data:
+            continue
+        by_year = {}
+        for entry in data:
+            year = entry["data"][:4]
+            by_year.setdefault(year, 0)
+            by_year[year] += entry["forecast"]
+        totals = {y_str: round(v / 1e9, 2) for y_str, v in by_year.items()}
+        cy_str = str(current_year)
+        if cy_str in totals:
+            totals[cy_str] = round((by_year[cy_str] + realized_current_year) / 1e9, 2)
+        annual_totals[name] = totals
+
+    realized_months = int((train_df["data"].dt.year == current_year).sum())
+    annual_totals["_realized"] = {
+        "year": current_year,
+        "months": realized_months,
+        "total_brl_bi": round(realized_current_year / 1e9, 2),
+    }
+
+    # Ensemble annual totals with Monte Carlo CIs; per-model ones come from
+    # the aggregate shared by all horizons
+    if ensemble_agg is not None:
+        annual_totals["ensemble_mc"] = _mc_annual_summary(ensemble_agg, 0)
+        if mc_annual is not None:
+            for i, name in enumerate(mc_annual["names"]):
+                annual_totals[f"{name}_mc"] = _mc_annual_summary(mc_annual["agg"], i)
+
+    return {
+        "ensemble_mean": ensemble,
+        "confidence_intervals": confidence_intervals,
+        "annual_totals": annual_totals,
+    }
+
+
 def _build_horizon_results(*, train_df, y, valid_models, full_sample_fits,
                            oos_horizon, forecasts_output, mc_simulations,
-                           future_df, n_future, last_icms_date, forecast_start):
+                           future_df, n_future, last_icms_date, forecast_start,
+                           oos_store=None, mc_annual=None, materialize=True,
+                           ensemble_aggs=None):
     """Build OOS validation, ensemble selection, CIs, and annual totals for one horizon.
 
+    mc_annual is the per-model Monte Carlo annual aggregate shared by all
+    horizons ({"names", "agg", "paths"}; see _aggregate_mc_paths).
+
+    With materialize=False only the OOS ranking and ensemble weights are
+    built; the point forecast, MC bands and annual totals are left out.
+    ensemble_aggs memoizes the ensemble MC aggregate by (components, weights)
+    across horizons that pick the same ensemble.
+
     Returns a dict with all horizon-specific results. Internal keys prefixed with
     '_' are stripped before serialization.
     """
     # =========================================================================
-    # Expanding-window OOS for this horizon
+    # Expanding-window OOS for this horizon (sliced from the shared store)
     # =========================================================================
-    expanding_window_data, effective_horizon = _run_all_expanding_windows(
-        train_df, y, ALL_MODEL_SPECS, full_sample_fits, oos_horizon=oos_horizon
-    )
+    if oos_store is not None and oos_horizon in oos_store["effective_horizons"]:
+        expanding_window_data, effective_horizon, oos_mode = _slice_oos_windows(
+            oos_store, oos_horizon
+        )
+    else:
+        oos_mode = "refit"
+        expanding_window_data, effective_horizon = _run_all_expanding_windows(
+            train_df, y, {n: ALL_MODEL_SPECS[n] for n in valid_models}, full_sample_fits,
+            oos_horizon=oos_horizon
+        )
 
     individual_mapes = {}
     for name in valid_models:
         if expanding_window_data and name in expanding_window_data:
             oos_result = _build_oos_result_from_windows(
-                expanding_window_data[name], effective_horizon
+                expanding_window_data[name], effective_horizon, mode=oos_mode
             )
         else:
             oos_result = {"status": "no_data", "mape": None}
@@ -800,31 +3221,34 @@ def _build_horizon_results(*, train_df, y, valid_models, full_sample_fits,
     # 2) Ensemble combinations within each family
     for family_name, family_members in [("original", original_family), ("prime", prime_family)]:
         suffix = "" if family_name == "original" else "'"
-        for combo_size in range(2, len(family_members) + 1):
-            for combo in combinations(family_members, combo_size):
-                combo_name = "Ensemble" + suffix + "(" + ",".join(
-                    m.replace("Modelo ", "M") for m in combo
-                ) + ")"
-                if expanding_window_data:
-                    oos_result = _compute_ensemble_mape_from_windows(
-                        expanding_window_data, list(combo)
-                    )
-                else:
-                    oos_result = None
-                if isinstance(oos_result, dict):
-                    ensemble_mape = oos_result.get("mape")
-                    ensemble_weights = oos_result.get("weights", {})
-                else:
-                    ensemble_mape = None
-                    ensemble_weights = {}
-                all_candidates[combo_name] = {
-                    "mape": ensemble_mape,
-                    "type": "ensemble",
-                    "components": list(combo),
-                    "weights": ensemble_weights,
-                    "weighting_method": "inverse_mse",
-                    "family": family_name,
-                }
+        combos = [combo for combo_size in range(2, len(family_members) + 1)
+                  for combo in combinations(family_members, combo_size)]
+        # All subsets of the family scored in one batched pass
+        if expanding_window_data:
+            with _perf_span("ensemble_search"):
+                oos_results = _search_ensembles_from_windows(
+                    expanding_window_data, family_members, combos
+                )
+        else:
+            oos_results = [None] * len(combos)
+        for combo, oos_result in zip(combos, oos_results):
+            combo_name = "Ensemble" + suffix + "(" + ",".join(
+                m.replace("Modelo ", "M") for m in combo
+            ) + ")"
+            if isinstance(oos_result, dict):
+                ensemble_mape = oos_result.get("mape")
+                ensemble_weights = oos_result.get("weights", {})
+            else:
+                ensemble_mape = None
+                ensemble_weights = {}
+            all_candidates[combo_name] = {
+                "mape": ensemble_mape,
+                "type": "ensemble",
+                "components": list(combo),
+                "weights": ensemble_weights,
+                "weighting_method": "inverse_mse",
+                "family": family_name,
+            }
 
     # Find best candidate overall (lowest MAPE)
     candidates_with_mape = {
@@ -851,40 +3275,14 @@ def _build_horizon_results(*, train_df, y, valid_models, full_sample_fits,
     ]
 
     # =========================================================================
-    # Ensemble point forecasts — inverse-MSE weighted
+    # Ensemble weights — inverse-MSE, from the best candidate
     # =========================================================================
-    ensemble = []
     best_weights = {}
     if best_candidate_name and best_candidate_name in all_candidates:
         best_info = all_candidates[best_candidate_name]
         if best_info.get("weights"):
             best_weights = best_info["weights"]
 
-    if valid_models:
-        n_periods = len(forecasts_output[valid_models[0]])
-        for i in range(n_periods):
-            date = forecasts_output[valid_models[0]][i]["data"]
-            if best_weights:
-                weighted_val = sum(
-                    best_weights.get(m, 0) * forecasts_output[m][i]["forecast"]
-                    for m in best_weights if m in forecasts_output
-                )
-                all_vals = [forecasts_output[m][i]["forecast"] for m in valid_models]
-                ensemble.append({
-                    "data": date,
-                    "forecast": round(_to_python(weighted_val), 2),
-                    "min": round(_to_python(np.min(all_vals)), 2),
-                    "max": round(_to_python(np.max(all_vals)), 2),
-                })
-            else:
-                values = [forecasts_output[m][i]["forecast"] for m in valid_models]
-                ensemble.append({
-                    "data": date,
-                    "forecast": round(_to_python(np.mean(values)), 2),
-                    "min": round(_to_python(np.min(values)), 2),
-                    "max": round(_to_python(np.max(values)), 2),
-                })
-
     ensemble_weighting = {
         "method": "inverse_mse" if best_weights else "equal_weight",
         "weights": best_weights if best_weights else {m: round(1/len(valid_models), 4) for m in valid_models},
@@ -902,106 +3300,15 @@ def _build_horizon_results(*, train_df, y, valid_models, full_sample_fits,
     else:
         mc_models_used = [n for n in valid_models if n in mc_simulations]
 
-    mc_confidence_intervals = []
-    mc_ensemble_paths = None
-
-    if mc_models_used:
-        stacked = np.stack([mc_simulations[n] for n in mc_models_used], axis=0)
-        if best_weights and all(n in best_weights for n in mc_models_used):
-            mc_weights = np.array([best_weights[n] for n in mc_models_used])
-            mc_weights = mc_weights / mc_weights.sum()
-            mc_ensemble_paths = np.tensordot(mc_weights, stacked, axes=([0], [0]))
-        else:
-            mc_ensemble_paths = np.mean(stacked, axis=0)
-
-        future_dates = future_df["data"].dt.strftime("%Y-%m-%d").tolist()
-        for t in range(n_future):
-            col = mc_ensemble_paths[:, t]
-            entry = {"data": future_dates[t]}
-            for p in MC_PERCENTILES:
-                entry[f"p{p}"] = round(float(np.percentile(col, p)), 2)
-            mc_confidence_intervals.append(entry)
-
-    # Confidence intervals dict
-    confidence_intervals = {
-        "source": "monte_carlo_ensemble" if mc_confidence_intervals else "analytical_best_model",
-        "n_models_in_ensemble": len(mc_models_used),
-        "models_used": mc_models_used,
-    }
-    if mc_confidence_intervals:
-        confidence_intervals["intervals"] = mc_confidence_intervals
-
-    # =========================================================================
-    # Annual totals with realized ICMS for current year
-    # =========================================================================
-    annual_totals = {}
-    future_years = future_df["data"].dt.year.values
-
-    current_year = last_icms_date.year
-    realized_current_year = float(
-        train_df.loc[train_df["data"].dt.year == current_year, "icms_sp"]
-        .astype(float).sum()
-    )
-
-    for name in valid_models + ["ensemble"]:
-        data = ensemble if name == "ensemble" else forecasts_output.get(name, [])
-        if not data:
-            continue
-        by_year = {}
-        for entry in data:
-            year = entry["data"][:4]
-            by_year.setdefault(year, 0)
-            by_year[year] += entry["forecast"]
-        totals = {y_str: round(v / 1e9, 2) for y_str, v in by_year.items()}
-        cy_str = str(current_year)
-        if cy_str in totals:
-            totals[cy_str] = round((by_year[cy_str] + realized_current_year) / 1e9, 2)
-        annual_totals[name] = totals
-
-    realized_months = int((train_df["data"].dt.year == current_year).sum())
-    annual_totals["_realized"] = {
-        "year": current_year,
-        "months": realized_months,
-        "total_brl_bi": round(realized_current_year / 1e9, 2),
-    }
-
-    # Ensemble annual totals with Monte Carlo CIs
-    if mc_ensemble_paths is not None:
-        unique_years = sorted(set(future_years))
-        mc_annual = {}
-        for yr in unique_years:
-            yr_indices = np.where(future_years == yr)[0]
-            if len(yr_indices) == 0:
-                continue
-            annual_sums = np.sum(mc_ensemble_paths[:, yr_indices], axis=1)
-            if yr == current_year:
-                annual_sums = annual_sums + realized_current_year
-            yr_entry = {}
-            for p in MC_PERCENTILES:
-                key = {5: "low_95", 25: "low_50", 50: "median", 75: "high_50", 95: "high_95"}[p]
-                yr_entry[key] = round(float(np.percentile(annual_sums, p)) / 1e9, 2)
-            yr_entry["mean"] = round(float(np.mean(annual_sums)) / 1e9, 2)
-            mc_annual[str(yr)] = yr_entry
-        annual_totals["ensemble_mc"] = mc_annual
-
-        all_mc_models = [n for n in valid_models if n in mc_simulations]
-        for name in all_mc_models:
-            model_sims = mc_simulations[name]
-            mc_model_annual = {}
-            for yr in unique_years:
-                yr_indices = np.where(future_years == yr)[0]
-                if len(yr_indices) == 0:
-                    continue
-                annual_sums = np.sum(model_sims[:, yr_indices], axis=1)
-                if yr == current_year:
-                    annual_sums = annual_sums + realized_current_year
-                yr_entry = {}
-                for p in MC_PERCENTILES:
-                    key = {5: "low_95", 25: "low_50", 50: "median", 75: "high_50", 95: "high_95"}[p]
-                    yr_entry[key] = round(float(np.percentile(annual_sums, p)) / 1e9, 2)
-                yr_entry["mean"] = round(float(np.mean(annual_sums)) / 1e9, 2)
-                mc_model_annual[str(yr)] = yr_entry
-            annual_totals[f"{name}_mc"] = mc_model_annual
+    materialized = {}
+    if materialize:
+        materialized = _materialize_horizon(
+            valid_models=valid_models, forecasts_output=forecasts_output,
+            mc_simulations=mc_simulations, mc_models_used=mc_models_used,
+            best_weights=best_weights, train_df=train_df, future_df=future_df,
+            n_future=n_future, last_icms_date=last_icms_date, mc_annual=mc_annual,
+            ensemble_aggs=ensemble_aggs,
+        )
 
     # =========================================================================
     # Forecast horizon metadata for this horizon
@@ -1019,19 +3326,11 @@ def _build_horizon_results(*, train_df, y, valid_models, full_sample_fits,
         "best_model": best_candidate_name,
         "best_model_mape": best_candidate_mape,
         "top5_ensembles": top5_ensembles,
-        "ensemble_mean": ensemble,
         "ensemble_weighting": ensemble_weighting,
-        "confidence_intervals": confidence_intervals,
-        "annual_totals": annual_totals,
-        "mc_annual_paths": {
-            model_name: {
-                str(yr): [round(float(v) / 1e9, 2) for v in paths[:, np.where(future_years == yr)[0]].sum(axis=1)]
-                for yr in sorted(set(future_years))
-                if len(np.where(future_years == yr)[0]) > 0
-            }
-            for model_name, paths in mc_simulations.items()
-        },
+        **materialized,
+        "materialized": materialize,
         "oos_effective_horizon": effective_horizon,
+        "oos_mode": oos_mode,
         "forecast_horizon": {
             "forecast_start": forecast_start.strftime("%Y-%m-%d"),
             "forecast_end": forecast_end_display.strftime("%Y-%m-%d"),